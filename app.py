@@ -1,15 +1,12 @@
 import json
-from flask import Flask, render_template, request, redirect, url_for, session, jsonify
-from flask_session import Session
-import pandas as pd
+import os
+from flask import Flask, render_template, request, redirect, url_for, session, jsonify, send_file, abort
 import numpy as np
 import atexit
 import time  # <--- ADD THIS
 
 # --- 1. NEW IMPORTS for Asynchronous Tasks (No Celery/Redis) ---
-import concurrent.futures
 import threading
-import uuid
 # -------------------------------------------------------------
 
 # --- NEW: Import your coupon scrapers ---
@@ -23,21 +20,67 @@ from coupon_scrapers import (
 # --- Your Project's Code ---
 # We still use db_models for our database logic
 import db_models
-from recommender import get_recommendations, train_dl_model, get_dl_recommendation_from_trained_model
-from myntra_scraper import scrape_myntra
-from snapdeal_scraper import scrape_snapdeal
-from nike_scraper import scrape_nike
-from max_scraper import scrape_max_fashion
+from facets import SORT_ORDERS, FACET_COLUMNS, DEFAULT_PAGE_SIZE
+import process_pool
+from product_table import ProductAccumulator
+from result_store import ResultStore, normalize_query
+import payloads
+import hybrid_recommender
+import cooccurrence
+from scheduler import JobScheduler, SchedulerBusy, PRIORITY_INTERACTIVE, PRIORITY_BACKGROUND, PRIORITY_TRAINING
+from fetch_engine import engine as fetch_engine
+from store_health import StoreHealth, HALF_OPEN, PROBE_BUDGET_SECONDS
+from task_registry import TaskRegistry, TooManyTasks
+from state_backend import create_backend
+from session_store import SQLiteSessionInterface
+import scraper_engine
+from store_adapters import STORE_ADAPTERS
+from image_cache import ImageCache, ImageUnavailable
+from search_log import search_log, PopularityModel
+from prewarmer import Prewarmer
 
 # --- App Configuration ---
 app = Flask(__name__)
 app.config["SECRET_KEY"] = "your_super_secret_key_change_this"
-app.config["SESSION_TYPE"] = "filesystem"
+# "sqlite": server-side sessions in sessions.db (see session_store)
+# "cookie": Flask's signed cookie (we only store user_id, username and last_query)
+# Compare them with bench_sessions.py
+app.config["SESSION_BACKEND"] = os.environ.get("SMARTCART_SESSION_BACKEND", "sqlite")
 app.config["SESSION_PERMANENT"] = False
-Session(app)
-
-# Ensure all new tables are created on startup
-db_models.create_tables()
+# A search publishes whatever it has after this many seconds...
+app.config["SEARCH_DEADLINE_SECONDS"] = 45
+# ...and each scraper is asked to wrap up (returning a partial list) after its own budget
+app.config["STORE_BUDGET_SECONDS"] = {"Myntra": 35, "Snapdeal": 35, "Nike": 30, "MaxFashion": 40}
+# Products each store stops at; a search may ask for fewer or more (?max_items=) up to the limit
+app.config["MAX_ITEMS_PER_STORE"] = 100
+app.config["MAX_ITEMS_LIMIT"] = 500
+# Stores fetched over HTTP (see HTTP_SCRAPERS) rather than with Selenium,
+# e.g. SMARTCART_HTTP_STORES=Snapdeal
+app.config["HTTP_STORES"] = {name for name in os.environ.get("SMARTCART_HTTP_STORES", "").split(",") if name}
+# Serve product images as cached thumbnails from /img/<hash> instead of hotlinking the store CDNs
+app.config["IMAGE_PROXY"] = os.environ.get("SMARTCART_IMAGE_PROXY", "1") != "0"
+# Thumbnails never change for a hash, so browsers may keep them this long
+app.config["IMAGE_MAX_AGE_SECONDS"] = 30 * 24 * 3600
+# A cached result older than this is a miss for new searches (users already viewing it keep it)
+app.config["RESULT_TTL_SECONDS"] = 6 * 3600
+# With a shared state backend, how often a worker checks for a newer result another worker published
+app.config["SHARED_RESULT_CHECK_SECONDS"] = 5
+# Re-scrape popular queries in the background before they go stale, off-peak only
+# (SMARTCART_PREWARM_HOURS, default 1-7; see prewarmer).
+# With several workers, turn it on in one of them: SMARTCART_PREWARM=0 in the rest.
+app.config["PREWARM"] = os.environ.get("SMARTCART_PREWARM", "1") != "0"
+
+# process_pool's spawned workers re-import this module as __mp_main__ just to
+# unpickle their jobs. They need none of the databases, caches or threads
+# below, so everything with a side effect only runs in the web process.
+IS_WEB_PROCESS = __name__ != "__mp_main__"
+
+if IS_WEB_PROCESS:
+    if app.config["SESSION_BACKEND"] == "sqlite":
+        app.session_interface = SQLiteSessionInterface()
+
+    # Ensure all new tables are created on startup
+    db_models.create_tables()
 
 # ... (after db_models.create_tables())
 
@@ -75,41 +118,41 @@ def run_coupon_scraper_loop():
 
 # --- 2. MODIFIED: Global Caches & Threading ---
 
-# Global cache for trained models
-model_cache = {}
+# The stores every search fans out to, one per adapter (see store_adapters)
+STORE_SCRAPERS = {name: scraper_engine.scraper(name) for name in STORE_ADAPTERS}
 
-# Global cache for product search results (DataFrames)
-product_cache = {}
+# Stores that can be scraped over plain HTTP on the asyncio fetch engine
+# instead of a browser. Opt in per store via app.config["HTTP_STORES"].
+HTTP_SCRAPERS = {name: scraper_engine.http_scraper(name) for name, adapter in STORE_ADAPTERS.items() if adapter.get("http")}
 
-# Global cache for entire search results (DataFrame + Filters)
-global_search_cache = {}
+# Nothing below exists in process-pool workers (see IS_WEB_PROCESS)
+result_store = state = tasks = scheduler = store_health = images = None
+if IS_WEB_PROCESS:
+    # Shared, versioned cache of processed search results (DataFrame + Filters +
+    # FacetIndex + trained model). Users hold a (query, version) pointer into it
+    # instead of their own DataFrame reference.
+    result_store = ResultStore()
 
-# This replaces Celery/Redis for managing job state
-task_cache = {}
-# We use a lock to safely read/write to task_cache from multiple threads
-task_cache_lock = threading.Lock()
+    # Where task status, streamed products and finished results are shared
+    # between worker processes (SMARTCART_STATE_BACKEND=sqlite[:path]); the
+    # default keeps everything in this process.
+    state = create_backend()
 
-# --- MODIFIED: Use 2 workers to prevent memory crashes but still get some parallelism ---
-executor = concurrent.futures.ThreadPoolExecutor(max_workers=3)
-# -----------------------------------------------
+    # This replaces Celery/Redis for managing job state. Finished tasks stay
+    # readable for a grace period and a reaper drops abandoned ones.
+    # Hold tasks.lock to safely read/write a task from multiple threads.
+    tasks = TaskRegistry(backend=state)
+
+    # Separate queues for scraping, processing and training (see scheduler.JOB_CLASSES),
+    # so one search's scrapers or a training job can't starve another user's search
+    scheduler = JobScheduler()
 
-# --- Smart Category Filtering (Unchanged) ---
-def categorize_product(name):
-    """Simple heuristic to categorize a product."""
-    name = name.lower()
-    if any(k in name for k in ['shoe', 'sneaker', 'boot', 'sandal', 'heel', 'loafe']):
-        return 'Footwear'
-    if any(k in name for k in ['shirt', 't-shirt', 'top', 'kurta', 'kurti', 'polo']):
-        return 'Apparel (Top)'
-    if any(k in name for k in ['pant', 'jeans', 'trouser', 'legging', 'skirt']):
-        return 'Apparel (Bottom)'
-    if any(k in name for k in ['dress', 'gown', 'jumpsuit']):
-        return 'Apparel (Full)'
-    if any(k in name for k in ['watch']):
-        return 'Accessory'
-    if any(k in name for k in ['bag', 'backpack', 'handbag']):
-        return 'Bags'
-    return 'Other'
+    # Per-store circuit breakers: stores that keep failing are skipped for a while
+    store_health = StoreHealth()
+
+    # On-disk thumbnail cache behind /img/<hash>
+    images = ImageCache() if app.config["IMAGE_PROXY"] else None
+# -----------------------------------------------
 
 # --- Authentication Routes (Unchanged) ---
 @app.route("/login", methods=["GET", "POST"])
@@ -147,6 +190,8 @@ def signup():
 
 @app.route("/logout")
 def logout():
+    if "user_id" in session:
+        result_store.release(session["user_id"])
     session.clear()
     return redirect(url_for("login"))
 
@@ -177,112 +222,399 @@ def profile():
 # --- API Routes ---
 
 # --- 3. NEW HELPER FUNCTION: Runs the final processing ---
-def process_final_data(task_id, query):
+def start_processing(task_id, query, task):
     """
-    This runs in a background thread *after* all scrapers are done.
-    It performs the expensive data processing and AI training.
+    Queues process_final_data for a task (caller holds tasks.lock).
+    Only one run per task is in flight; late results trigger another run.
     """
-    print(f"THREADED JOB {task_id}: All scrapers finished. Processing final data...")
+    first_publish = task["version"] is None
+    if first_publish:
+        tasks.transition(task, "PROCESSING") # Tell frontend to wait
+    task["processing"] = True
+    priority = task["priority"] if first_publish else PRIORITY_BACKGROUND
     try:
-        with task_cache_lock:
-            # Get all collected products
-            task = task_cache[task_id]
-            all_products = task["all_products"]
+        scheduler.submit("process", priority, process_final_data, task_id, query)
+    except SchedulerBusy as e:
+        task["processing"] = False
+        if first_publish:
+            tasks.transition(task, "ERROR", message=f"Server busy, please try again. ({e})")
 
-        if not all_products:
-            raise Exception("No products found by any scraper.")
-
-        # --- This is all your processing logic ---
-        df = pd.DataFrame(all_products)
-        df.drop_duplicates(subset=['Product Name'], inplace=True)
-        if 'Price' not in df.columns: df['Price'] = 0
-        df = df[df['Price'] > 0]
-        df.reset_index(drop=True, inplace=True)
-        
+def process_final_data(task_id, query):
+    """
+    This runs on the 'process' queue once all scrapers are done *or* the
+    search deadline passes, on whatever has arrived so far. Results that
+    arrive later run it again, publishing a merged version of the entry.
+    AI training is queued separately so the user doesn't wait for it.
+    """
+    with tasks.lock:
+        task = tasks.get(task_id)
+        if task is None or task["status"] == "ERROR":
+            return
+        products = task["products"]
+        stores = dict(task["stores"])
+        max_items = task["max_items"]
+        first_publish = task["version"] is None
+
+    # Batches were already cleaned, deduped and categorized as they arrived;
+    # this just freezes everything merged so far into the product table
+    df, filter_options = products.freeze()
+    frozen = len(df)
+    print(f"THREADED JOB {task_id}: Processing {len(df)} products. Stores: {stores}")
+    try:
         if df.empty:
-            raise Exception("No valid products found after filtering (e.g., price=0).")
-
-        df['Category'] = df['Product Name'].apply(categorize_product)
+            raise Exception("No valid products found by any scraper.")
 
-        # Extract Filters
-        unique_stores = sorted(df['Store'].unique().tolist())
-        unique_brands = sorted(df['Product Name'].apply(lambda x: x.split(' ')[0]).unique().tolist())
-        unique_categories = sorted(df['Category'].unique().tolist())
-        min_price = int(df['Price'].min())
-        max_price = int(df['Price'].max())
-        
-        filter_options = {
-            "stores": unique_stores,
-            "brands": unique_brands,
-            "categories": unique_categories,
-            "minPrice": min_price,
-            "maxPrice": max_price
-        }
-        
-        # Train AI Model
-        print(f"THREADED JOB {task_id}: Training model for query: {query}")
-        model, tokenizer, max_length = train_dl_model(df)
-        
-        # --- Update shared caches ---
-        model_cache[query] = (model, tokenizer, max_length)
-        global_search_cache[query] = (df, filter_options) # Save final *processed* data
-        
-        # --- Store the final result in the task_cache ---
-        with task_cache_lock:
-            task = task_cache[task_id]
-            task["status"] = "SUCCESS"
-            task["all_products"] = df.to_dict('records') # Store final, cleaned list
-            task["filters"] = filter_options
-        
-        print(f"THREADED JOB {task_id}: Finished processing.")
+        # --- This is all your processing logic ---
+        # Cross-store matching, facet index and TF-IDF index are built in a
+        # worker process and handed back through shared memory
+        result = process_pool.build_indexes(df)
+        df, facets = result["df"], result["facets"]
+        print(f"THREADED JOB {task_id}: Product table has {len(df)} rows, {df.memory_usage(deep=True).sum() // 1024} KB.")
+
+        # --- Update shared cache (one copy per query, shared by all users) ---
+        created_at = time.time()
+        version = result_store.put(query, df, filter_options, facets, name_index=result["name_index"],
+                                   store_status=stores, neighbours=result["neighbours"], max_items=max_items,
+                                   created_at=created_at)
+        if state.shared:
+            # ...and for the other worker processes
+            shared_version = state.save_result(normalize_query(query), {
+                "df": df, "filters": filter_options, "facets": facets, "name_index": result["name_index"],
+                "store_status": stores, "neighbours": result["neighbours"], "max_items": max_items,
+            }, created_at)
+            entry = result_store.get(query, version)
+            if entry is not None:
+                entry.shared_version = shared_version
 
     except Exception as e:
         print(f"THREADED JOB {task_id}: FAILED during final processing. {e}")
-        with task_cache_lock:
-            task_cache[task_id] = {"status": "ERROR", "message": str(e)}
+        with tasks.lock:
+            task["processing"] = False
+            if first_publish:
+                tasks.transition(task, "ERROR", message=str(e))
+        return
+
+    # --- Store the final result on the task ---
+    with tasks.lock:
+        tasks.transition(task, "SUCCESS", version=version, filters=filter_options)
+        task["processing"] = False
+        merging = len(products) > frozen
+        if merging:
+            # More results landed while we were processing; merge them in
+            start_processing(task_id, query, task)
+
+    print(f"THREADED JOB {task_id}: Finished processing (v{version}).")
+    if merging:
+        return # The merged version trains instead
+
+    # Train AI Model in the background; recommendations pick it up when ready
+    try:
+        scheduler.submit("train", PRIORITY_TRAINING, train_model_for_entry, query, version)
+    except SchedulerBusy as e:
+        print(f"THREADED JOB {task_id}: Skipping model training. {e}")
+
+def on_search_deadline(task_id, query):
+    """Fires SEARCH_DEADLINE_SECONDS after dispatch: publish whatever has arrived."""
+    with tasks.lock:
+        task = tasks.get(task_id)
+        if task is None or task["status"] != "PENDING":
+            return
+        for store_name, status in list(task["stores"].items()):
+            if status == "pending":
+                tasks.set_store_status(task, store_name, "timed_out")
+        print(f"THREADED JOB {task_id}: Search deadline reached. Stores: {task['stores']}")
+        start_processing(task_id, query, task)
+
+def train_model_for_entry(query, version):
+    """Trains the DL model for one cached result and attaches it to that entry."""
+    current = result_store.get(query)
+    if current is None or current.version != version:
+        # Evicted, or a late store merge published a newer version that trains instead
+        print(f"TRAIN JOB: Skipping superseded result for query: {query} (v{version})")
+        return
+    entry = current
+    print(f"TRAIN JOB: Training model for query: {query} (v{version})")
+    try:
+        entry.model, neighbours = process_pool.train_embeddings(entry.df)
+        if neighbours is not None:
+            entry.neighbours["ai"] = neighbours
+    except Exception as e:
+        print(f"TRAIN JOB: Training FAILED for query: {query}. {e}")
 
 # --- 4. NEW HELPER FUNCTION: Runs ONE scraper ---
-def run_one_scraper(task_id, store_name, scraper_func, query):
+def run_one_scraper(task_id, store_name, scraper_func, query, max_items=None, probe=False):
     """
-    This function runs one scraper in a background thread.
-    It updates the task_cache with its partial results.
+    This function runs one (Selenium) scraper in a background thread.
+    It updates its task with its partial results.
+    The scraper is given its own budget and returns early (partial) when it
+    runs out, and stops once it has `max_items` products.
+    A probe run (store recovering from an open circuit) gets a shorter budget.
     """
-    print(f"THREADED JOB {task_id}: Starting scraper '{store_name}' for '{query}'")
+    print(f"THREADED JOB {task_id}: Starting scraper '{store_name}' for '{query}'{' (probe)' if probe else ''}")
+    started, deadline = scraper_deadline(store_name, probe)
     try:
         # Run the actual scraper function
-        results = scraper_func(query)
-        print(f"THREADED JOB {task_id}: Scraper '{store_name}' finished, found {len(results)} items.")
-        
-        if results:
-            with task_cache_lock:
-                task = task_cache[task_id]
-                # Add to the master list *and* the "new" queue
-                task["all_products"].extend(results)
-                task["new_products_queue"].extend(results)
-
+        results = scraper_func(query, deadline=deadline, max_items=max_items)
     except Exception as e:
-        print(f"THREADED JOB {task_id}: Scraper '{store_name}' FAILED: {e}")
+        finish_scraper(task_id, store_name, query, started, deadline, error=e)
+        return
+    finish_scraper(task_id, store_name, query, started, deadline, results)
+
+def run_one_http_scraper(task_id, store_name, scraper_coro, query, max_items=None, probe=False):
+    """
+    Starts an async (HTTP) scraper on the fetch engine's event loop and
+    returns immediately; no thread waits on the network. finish_scraper
+    runs from the loop when the coroutine completes.
+    """
+    print(f"ASYNC JOB {task_id}: Starting HTTP scraper '{store_name}' for '{query}'{' (probe)' if probe else ''}")
+    started, deadline = scraper_deadline(store_name, probe)
+
+    def done(future):
+        try:
+            results = future.result()
+        except Exception as e:
+            finish_scraper(task_id, store_name, query, started, deadline, error=e)
+            return
+        finish_scraper(task_id, store_name, query, started, deadline, results)
+
+    fetch_engine.submit(scraper_coro(query, deadline=deadline, max_items=max_items)).add_done_callback(done)
+
+def scraper_deadline(store_name, probe):
+    """(start, deadline) for one store's run; a probe gets a shorter budget."""
+    budget = app.config["STORE_BUDGET_SECONDS"].get(store_name, app.config["SEARCH_DEADLINE_SECONDS"])
+    if probe:
+        budget = min(budget, PROBE_BUDGET_SECONDS)
+    started = time.time()
+    return started, started + budget
+
+def finish_scraper(task_id, store_name, query, started, deadline, results=None, error=None):
+    """Merges one store's results (or failure) into its task."""
+    results = results or []
+    if error is not None:
+        print(f"THREADED JOB {task_id}: Scraper '{store_name}' FAILED: {error}")
         # Don't add any results, just log the failure
-        pass # We still want other scrapers to run
-
-    finally:
-        # This block *always* runs, even if the scraper failed
-        with task_cache_lock:
-            task = task_cache[task_id]
-            task["remaining_scrapers"] -= 1
-            print(f"THREADED JOB {task_id}: '{store_name}' done. {task['remaining_scrapers']} scrapers remaining.")
-            
+        status = "failed" # We still want other scrapers to run
+        error = str(error)
+    else:
+        status = "partial" if time.time() >= deadline else "complete"
+        print(f"THREADED JOB {task_id}: Scraper '{store_name}' finished ({status}), found {len(results)} items.")
+    store_health.record(store_name, bool(results), time.time() - started, len(results), error)
+
+    with tasks.lock:
+        task = tasks.get(task_id)
+        if task is None or task["status"] == "ERROR":
+            return
+        products = task["products"]
+
+    if images is not None:
+        images.rewrite(results) # Image URLs -> /img/<hash>
+
+    # Clean, dedupe (against every store so far) and categorize this batch
+    # now, so streamed products have no duplicates and final processing has
+    # nothing left to do but freeze
+    added = products.add(results)
+
+    with tasks.lock:
+        task = tasks.get(task_id)
+        if task is None or task["status"] == "ERROR":
+            return
+
+        if added:
+            # Append to the product log; pollers pick them up by offset
+            tasks.append_products(task, added)
+
+        if task["stores"][store_name] == "timed_out":
+            # Arrived after the search deadline; merged into the cached entry
+            status = "late" if added else "timed_out"
+        tasks.set_store_status(task, store_name, status)
+        task["remaining_scrapers"] -= 1
+        print(f"THREADED JOB {task_id}: '{store_name}' done. {task['remaining_scrapers']} scrapers remaining.")
+
+        if task["status"] == "PENDING":
             # If this is the *last* scraper to finish, trigger the final processing
             if task["remaining_scrapers"] == 0:
-                task["status"] = "PROCESSING" # Tell frontend to wait
-                executor.submit(process_final_data, task_id, query)
+                if task["deadline_timer"] is not None:
+                    task["deadline_timer"].cancel()
+                start_processing(task_id, query, task)
+        elif added and not task["processing"]:
+            # Late results after publishing: merge them into a new version
+            start_processing(task_id, query, task)
+
+# --- Results published by other worker processes ---
+def get_result(query):
+    """
+    The cached entry for a query. With a shared backend, (re)loads the
+    result another worker published when it is newer than ours (late
+    store merges, prewarm refreshes), checking at most every
+    SHARED_RESULT_CHECK_SECONDS per entry.
+    """
+    entry = result_store.get(query)
+    if not state.shared:
+        return entry
+    if entry is not None and time.time() - entry.checked_at < app.config["SHARED_RESULT_CHECK_SECONDS"]:
+        return entry
+    key = normalize_query(query)
+    info = state.result_info(key)
+    if entry is not None:
+        entry.checked_at = time.time()
+        if info is None or info[0] == entry.shared_version or info[1] <= entry.created_at:
+            return entry # Ours is the latest
+    elif info is None:
+        return None
+    loaded = state.load_result(key)
+    if loaded is None:
+        return entry
+    bundle, shared_version, created_at = loaded
+    result_store.put(query, **bundle, created_at=created_at, shared_version=shared_version)
+    return result_store.get(query)
+
+def point_user(user_id, query, max_age=None, max_items=None):
+    """result_store.point on the latest result, including one another worker published."""
+    get_result(query)
+    return result_store.point(user_id, query, max_age, max_items)
+
+# --- Encoded, cached response bodies ---
+def send_body(body, status=200):
+    """Sends a pre-encoded EncodedBody, compressed if the client accepts it."""
+    data, encoding = body.select(request.headers.get("Accept-Encoding", ""))
+    response = app.response_class(data, status=status, mimetype="application/json")
+    if encoding:
+        response.headers["Content-Encoding"] = encoding
+    response.headers["Vary"] = "Accept-Encoding"
+    return response
+
+def first_page_body(entry):
+    """The SUCCESS payload for a search; encoded once per (query, version)."""
+    def build():
+        first_page = entry.facets.query()
+        return payloads.EncodedBody(payloads.encode({
+            "status": "SUCCESS",
+            "products": payloads.products(entry.facets, first_page["rows"]),
+            "total": first_page["total"],
+            "facets": first_page["facets"],
+            "filters": entry.filters,
+            "stores": entry.store_status,
+            "message": f"Found {first_page['total']} unique products."
+        }))
+    return entry.cached_body(("first_page",), build)
+
+# --- Starting a search (user searches and prewarming) ---
+def dispatch_search(query, max_items, priority=PRIORITY_INTERACTIVE):
+    """
+    Creates the task for a search and starts its scrapers. Returns the
+    task ID, or None if every store's circuit is open. Raises TooManyTasks
+    or SchedulerBusy when the server is already at capacity.
+    """
+    # Stores with an open circuit are skipped instead of launching a browser for them
+    modes = {name: store_health.acquire(name) for name in STORE_SCRAPERS}
+    run_stores = [name for name, mode in modes.items() if mode is not None]
+    if not run_stores:
+        return None
+
+    def release_probes():
+        for name in run_stores:
+            if modes[name] == HALF_OPEN:
+                store_health.release(name)
+
+    # Create the shared task object (starts out PENDING; then PROCESSING, SUCCESS or ERROR)
+    try:
+        task_id = tasks.create({
+            "query": query,
+            "priority": priority,
+            "max_items": max_items,
+            "remaining_scrapers": len(run_stores), # A counter
+            "stores": {name: "pending" if name in run_stores else "skipped" for name in STORE_SCRAPERS},
+            "all_products": [], # Append-only log of *all* products found, read by offset
+            "products": ProductAccumulator(), # Deduped, categorized running merge
+            "filters": None,
+            "version": None, # Result version once published
+            "processing": False, # A process_final_data run is in flight
+            "deadline_timer": None,
+        })
+    except TooManyTasks:
+        release_probes()
+        raise
+    print(f"Dispatching {len(run_stores)} THREADED jobs for: {query} (task {task_id})")
+
+    # Browser scrapers go to the 'scrape' queue, all-or-nothing; HTTP
+    # scrapers go straight to the fetch engine's event loop
+    http_stores = [name for name in run_stores if name in app.config["HTTP_STORES"] and name in HTTP_SCRAPERS]
+    try:
+        scheduler.submit_batch("scrape", priority, [
+            (run_one_scraper, (task_id, name, STORE_SCRAPERS[name], query, max_items), {"probe": modes[name] == HALF_OPEN})
+            for name in run_stores if name not in http_stores
+        ])
+    except SchedulerBusy:
+        with tasks.lock:
+            tasks.discard(task_id)
+        release_probes()
+        raise
+    for name in http_stores:
+        run_one_http_scraper(task_id, name, HTTP_SCRAPERS[name], query, max_items, probe=modes[name] == HALF_OPEN)
+
+    # Publish whatever has arrived once the overall deadline passes
+    with tasks.lock:
+        task = tasks.get(task_id)
+        if task is not None and task["status"] == "PENDING":
+            task["deadline_timer"] = threading.Timer(app.config["SEARCH_DEADLINE_SECONDS"], on_search_deadline, (task_id, query))
+            task["deadline_timer"].daemon = True
+            task["deadline_timer"].start()
+    return task_id
+
+# --- Prewarming: popular queries are re-scraped before they go stale ---
+def prewarm_search(query):
+    """Starts a background-priority search for the prewarmer. None if it couldn't start."""
+    try:
+        return dispatch_search(query, app.config["MAX_ITEMS_PER_STORE"], PRIORITY_BACKGROUND)
+    except (TooManyTasks, SchedulerBusy) as e:
+        print(f"PREWARM: Skipping '{query}'. {e}")
+        return None
+
+def search_running(task_id):
+    with tasks.lock:
+        task = tasks.get(task_id)
+        return task is not None and task["status"] in ("PENDING", "PROCESSING")
+
+def cached_age(query):
+    """
+    Seconds since the newest result for a query was published: this
+    worker's, or with a shared backend any worker's, so the prewarmer
+    doesn't redo a search another worker just ran. None if there is none.
+    """
+    ages = [result_store.age(query)]
+    if state.shared:
+        info = state.result_info(normalize_query(query))
+        if info is not None:
+            ages.append(time.time() - info[1])
+    ages = [age for age in ages if age is not None]
+    return min(ages) if ages else None
+
+def scrapers_busy():
+    """Users are waiting on the browser scrapers: jobs queued, or over half the workers running."""
+    scrape = scheduler.stats()["scrape"]
+    return scrape["depth"] > 0 or scrape["running"] * 2 > scrape["workers"]
+
+def search_cost():
+    """Browser-seconds one search takes: each browser store's median run, else its budget."""
+    timings = scraper_engine.stats()
+    return sum(
+        timings.get(name, {}).get("median_seconds") or app.config["STORE_BUDGET_SECONDS"].get(name, app.config["SEARCH_DEADLINE_SECONDS"])
+        for name in STORE_SCRAPERS if not (name in app.config["HTTP_STORES"] and name in HTTP_SCRAPERS)
+    )
+
+# Decayed search counts per query, read from the searches table (all workers' searches)
+popularity = PopularityModel()
+prewarmer = None
+if IS_WEB_PROCESS and app.config["PREWARM"]:
+    prewarmer = Prewarmer(popularity, prewarm_search, search_running, cached_age, scrapers_busy, search_cost,
+                          ttl=app.config["RESULT_TTL_SECONDS"])
 
 # --- 5. MODIFIED: /api/search ---
 @app.route("/api/search")
 def api_search():
     """
     This is now a FAST, ASYNCHRONOUS route.
-    It dispatches 4 background jobs and returns a task ID.
+    It dispatches the scraper jobs and returns a task ID.
     """
     if "user_id" not in session:
         return jsonify({"error": "Unauthorized"}), 401
@@ -290,42 +622,31 @@ def api_search():
     if not query:
         return jsonify({"error": "No query provided"}), 400
     
-    session['last_query'] = query
-
-    # --- CHECK GLOBAL CACHE FIRST (Unchanged) ---
-    if query in global_search_cache:
+    # Per-store cap on products, so a search's cost is predictable
+    max_items = request.args.get("max_items", type=int) or app.config["MAX_ITEMS_PER_STORE"]
+    max_items = max(1, min(max_items, app.config["MAX_ITEMS_LIMIT"]))
+
+    if session.get('last_query') != query:
+        session['last_query'] = query # Only write the session when it changes
+
+    # --- CHECK GLOBAL CACHE FIRST ---
+    # A result scraped with a lower cap than this search asks for is a miss
+    entry = point_user(session['user_id'], query, max_age=app.config["RESULT_TTL_SECONDS"], max_items=max_items)
+    search_log.record(session['user_id'], query, cache_hit=entry is not None)
+    if entry is not None:
         print(f"User {session['user_id']} got CACHE HIT for query: {query}")
-        df, filter_options = global_search_cache[query]
-        product_cache[session['user_id']] = df
-        return jsonify({
-            "status": "SUCCESS", 
-            "products": df.to_dict('records'),
-            "filters": filter_options,
-            "message": f"Found {len(df)} unique products (from cache)."
-        })
+        # Only the first page goes out; the rest is served by /api/products
+        return send_body(first_page_body(entry))
     # --- END OF CACHE CHECK ---
-    
-    print(f"User {session['user_id']} got CACHE MISS. Dispatching 4 THREADED jobs for: {query}")
 
-    # --- THIS IS THE NEW PART ---
-    task_id = str(uuid.uuid4())
-    
-    # Create the shared task object
-    with task_cache_lock:
-        task_cache[task_id] = {
-            "status": "PENDING", # PENDING, PROCESSING, SUCCESS, ERROR
-            "remaining_scrapers": 4, # A counter
-            "all_products": [], # Master list of *all* products found
-            "new_products_queue": [], # Products to be sent to client
-            "filters": None
-        }
-    
-    # Submit 4 separate jobs to the thread pool
-    # The executor will run them based on max_workers (e.g., 2 at a time)
-    executor.submit(run_one_scraper, task_id, "Myntra", scrape_myntra, query)
-    executor.submit(run_one_scraper, task_id, "Snapdeal", scrape_snapdeal, query)
-    executor.submit(run_one_scraper, task_id, "Nike", scrape_nike, query)
-    executor.submit(run_one_scraper, task_id, "MaxFashion", scrape_max_fashion, query)
+    print(f"User {session['user_id']} got CACHE MISS for query: {query}")
+    try:
+        task_id = dispatch_search(query, max_items)
+    except (TooManyTasks, SchedulerBusy) as e:
+        print(f"User {session['user_id']} rejected: {e}")
+        return jsonify({"error": "Too many searches in progress. Please try again shortly."}), 503
+    if task_id is None:
+        return jsonify({"error": "All stores are temporarily unavailable. Please try again later."}), 503
     
     # Immediately return the task ID
     return jsonify({
@@ -338,61 +659,157 @@ def api_search():
 def api_search_status(task_id):
     """
     Checks the status of a job.
-    If "PENDING", it returns any new products.
-    If "SUCCESS", it returns the final processed data.
+    If "PENDING" or "PROCESSING", it returns the products found past
+    ?since=<offset> and the offset to ask for next. Nothing is consumed,
+    so several tabs can poll the same task and a lost response is just
+    fetched again.
+    If "SUCCESS", it returns the first page of the final processed data.
     """
     if "user_id" not in session:
         return jsonify({"error": "Unauthorized"}), 401
+    since = max(request.args.get("since", 0, type=int), 0)
     
-    with task_cache_lock:
-        task = task_cache.get(task_id)
-
-    if not task:
-        return jsonify({"status": "ERROR", "message": "Task not found"}), 404
-    
-    if task["status"] == "SUCCESS":
-        # Final success state: return all data and clear task
-        with task_cache_lock:
-            if task_id in task_cache:
-                del task_cache[task_id] # Clean up
-        
-        # Set the user's personal cache
-        query = session.get('last_query')
-        if query and query in global_search_cache:
-             df, _ = global_search_cache[query]
-             product_cache[session['user_id']] = df
-
-        return jsonify({
-            "status": "SUCCESS",
-            "products": task["all_products"],
-            "filters": task["filters"]
-        })
-
-    elif task["status"] == "PROCESSING":
+    # Read everything we need in one go, so the reaper or a late merge
+    # can't change the task halfway through this request
+    with tasks.lock:
+        task = tasks.get(task_id)
+        if task is not None:
+            status = task["status"]
+            query = task["query"]
+            message = task.get("message")
+            stores = dict(task["stores"])
+            new_products_to_send = []
+            cursor = len(task["all_products"])
+            if status in ("PENDING", "PROCESSING"):
+                new_products_to_send = task["all_products"][since:cursor]
+
+    if task is None:
+        # Not running in this process; another worker may own it
+        shared = state.read_task(task_id, since)
+        if shared is None:
+            return jsonify({"status": "ERROR", "message": "Task not found or expired. Please search again."}), 404
+        status, query, message = shared["status"], shared["query"], shared["message"]
+        stores, cursor, new_products_to_send = shared["stores"], shared["cursor"], shared["new_products"]
+
+    if status == "SUCCESS":
+        # Final success state. The task stays around for a grace period
+        # (other tabs, retried polls); the reaper cleans it up.
+        # Point the user at the shared result
+        entry = point_user(session['user_id'], query)
+        if entry is None:
+            return jsonify({"status": "ERROR", "message": "Search results expired. Please search again."}), 410
+
+        return send_body(first_page_body(entry))
+
+    elif status == "PROCESSING":
         # Scrapers are done, but final processing (AI) is running.
-        return jsonify({"status": "PROCESSING", "new_products": []})
+        return jsonify({"status": "PROCESSING", "cursor": cursor, "new_products": new_products_to_send})
 
-    elif task["status"] == "ERROR":
+    elif status == "ERROR":
         # An error occurred during final processing
-        with task_cache_lock:
-            if task_id in task_cache:
-                del task_cache[task_id]
-        return jsonify(task), 500 # task contains the error message
+        return jsonify({"status": "ERROR", "message": message}), 500
 
-    elif task["status"] == "PENDING":
+    else:
         # Scrapers are still running. Send any new products.
-        new_products_to_send = []
-        with task_cache_lock:
-            task = task_cache[task_id] # Re-get task inside lock
-            # Send everything in the queue and clear it
-            new_products_to_send = task["new_products_queue"]
-            task["new_products_queue"] = []
-        
         return jsonify({
             "status": "PENDING",
+            "stores": stores,
+            "cursor": cursor,
             "new_products": new_products_to_send
         })
 
+# --- Server-side filtering & pagination over cached results ---
+@app.route("/api/products")
+def api_products():
+    """
+    Returns one page of a cached search, filtered and sorted on the server.
+    Accepts q, min_price, max_price, store/brand/category (repeatable),
+    sort, page and limit.
+    """
+    if "user_id" not in session:
+        return jsonify({"error": "Unauthorized"}), 401
+
+    # Prefer the version this user is looking at; fall back to the current one
+    query = request.args.get("q")
+    entry = result_store.resolve(session['user_id'])
+    if query and (entry is None or entry.query != normalize_query(query)):
+        entry = get_result(query)
+    if entry is None:
+        return jsonify({"error": "No search data found. Please search first."}), 404
+
+    sort = request.args.get("sort", "relevance")
+    if sort not in SORT_ORDERS:
+        return jsonify({"error": f"Unknown sort order '{sort}'."}), 400
+
+    params = {
+        "min_price": request.args.get("min_price", type=int),
+        "max_price": request.args.get("max_price", type=int),
+        "selected": {facet: sorted(request.args.getlist(facet)) for facet in FACET_COLUMNS},
+        "sort": sort,
+        "page": request.args.get("page", 1, type=int),
+        "limit": request.args.get("limit", DEFAULT_PAGE_SIZE, type=int),
+    }
+    key = ("products", params["min_price"], params["max_price"],
+           tuple(tuple(v) for v in params["selected"].values()),
+           sort, params["page"], params["limit"])
+
+    def build():
+        result = entry.facets.query(**params)
+        result["products"] = payloads.products(entry.facets, result.pop("rows"))
+        return payloads.EncodedBody(payloads.encode(result))
+
+    return send_body(entry.cached_body(key, build))
+
+@app.route("/api/admin/scheduler")
+def api_scheduler_stats():
+    """Queue depth, concurrency and wait-time percentiles per job class."""
+    if "user_id" not in session:
+        return jsonify({"error": "Unauthorized"}), 401
+    return jsonify(scheduler.stats())
+
+@app.route("/api/admin/stores")
+def api_store_health():
+    """Circuit state, success rate, latency, item counts and scrape timings per store."""
+    if "user_id" not in session:
+        return jsonify({"error": "Unauthorized"}), 401
+    stats = store_health.stats()
+    for name, timing in scraper_engine.stats().items():
+        stats.setdefault(name, {})["engine"] = timing
+    return jsonify(stats)
+
+@app.route("/api/admin/prewarm")
+def api_prewarm_stats():
+    """Search log volume, tracked queries, prewarm budget use and the most popular queries."""
+    if "user_id" not in session:
+        return jsonify({"error": "Unauthorized"}), 401
+    if prewarmer is None:
+        return jsonify({"enabled": False, "searches_logged": search_log.logged})
+    stats = prewarmer.stats()
+    stats.update({
+        "enabled": True,
+        "searches_logged": search_log.logged,
+        "top": [{"query": q, "score": round(s, 2), "age_seconds": cached_age(q)}
+                for q, s in popularity.top(prewarmer.top_n)],
+    })
+    return jsonify(stats)
+
+@app.route("/img/<image_hash>")
+def image_proxy(image_hash):
+    """A product image as a cached thumbnail; WebP when the browser accepts it."""
+    if images is None:
+        abort(404)
+    try:
+        path, mimetype = images.thumbnail(image_hash, webp="image/webp" in request.headers.get("Accept", ""))
+    except KeyError:
+        abort(404)
+    except ImageUnavailable as e:
+        return redirect(e.url) # Let the browser try the store directly
+    response = send_file(path, mimetype=mimetype, conditional=True, etag=True,
+                         max_age=app.config["IMAGE_MAX_AGE_SECONDS"])
+    response.headers["Cache-Control"] = f"public, max-age={app.config['IMAGE_MAX_AGE_SECONDS']}, immutable"
+    response.headers["Vary"] = "Accept"
+    return response
+
 @app.route("/api/recommend")
 def api_recommend():
     if "user_id" not in session:
@@ -403,50 +820,39 @@ def api_recommend():
         return jsonify({"error": "No product name provided"}), 400
         
     db_models.log_click(session["user_id"], product_name)
+    cooccurrence.graph.sync() # Folds in the new click (and any from other workers)
     
-    try:
-        df = product_cache[session['user_id']]
-    except KeyError:
+    # The user's pinned result version; survives a refresh of the same query
+    entry = result_store.resolve(session['user_id'])
+    if entry is None and session.get('last_query'):
+        entry = get_result(session['last_query'])
+    if entry is None:
         return jsonify({"error": "No search data found. Please search first."}), 400
-    
+
+    row = entry.row_of(product_name)
+    if row is None:
+        return jsonify({"similar": [], "ai_powered": []})
+
     # --- Combined Recommendation Logic ---
-    
-    final_recs_list = []
-    seen_urls = set()
-
-    # 1. Get AI-Based (DL)
-    query = session.get('last_query', 'default')
-    if query in model_cache:
-        model, product_to_id, max_length = model_cache[query]
-        if model:
-            dl_names_df = get_dl_recommendation_from_trained_model(product_name, df, model, product_to_id, max_length)
-            if not dl_names_df.empty:
-                for rec in dl_names_df.to_dict(orient='records'):
-                    if rec['Product URL'] not in seen_urls:
-                        
-                        # --- THIS IS THE NEW LINE ---
-                        rec['rec_type'] = 'ai' # Tag as AI
-                        
-                        final_recs_list.append(rec)
-                        seen_urls.add(rec['Product URL'])
-
-    # 2. Get Content-Based (Similar Name)
-    rec_names_df = get_recommendations(product_name, df)
-    if not rec_names_df.empty:
-        for rec in rec_names_df.to_dict(orient='records'):
-            if rec['Product URL'] not in seen_urls:
-                
-                # --- THIS IS THE NEW LINE ---
-                rec['rec_type'] = 'name' # Tag as Name-Based
-                
-                final_recs_list.append(rec)
-                seen_urls.add(rec['Product URL'])
-
-    # Return a single combined list
-    return jsonify({
-        "similar": [], 
-        "ai_powered": final_recs_list
-    })
+    # Candidates from every source (precomputed AI/name neighbours, same
+    # category and price band, co-clicks and co-wishlists), ranked by one weighted blend
+    def build():
+        rows, scores, per_source, skipped = hybrid_recommender.recommend(entry, row, product_name)
+        recs = payloads.records(entry.facets, rows)
+        for i, rec in enumerate(recs):
+            rec["score"] = round(float(scores[i]), 4)
+            rec["scores"] = {source: round(float(values[i]), 4) for source, values in per_source.items()}
+            # The source that contributed most, for the UI badge
+            rec["rec_type"] = max(per_source, key=lambda s: per_source[s][i] * hybrid_recommender.SOURCE_WEIGHTS[s])
+        return payloads.EncodedBody(payloads.encode({
+            "similar": [],
+            "ai_powered": recs,
+            "skipped_sources": skipped,
+        }))
+
+    # Co-occurrence weights move as people click, so cached bodies only live for a minute
+    key = ("recommend", row, "ai" in entry.neighbours, int(time.time() // 60))
+    return send_body(entry.cached_body(key, build))
     
 # --- Feature 2 & 3: Wishlist & Price Track API (Unchanged) ---
 @app.route("/api/wishlist/add", methods=["POST"])
@@ -456,6 +862,7 @@ def api_add_to_wishlist():
     product = request.json
     success = db_models.add_to_wishlist(session['user_id'], product)
     if success:
+        cooccurrence.graph.sync()
         return jsonify({"success": True, "message": "Added to wishlist."})
     else:
         return jsonify({"success": False, "message": "Item already in wishlist."})
@@ -492,8 +899,12 @@ def api_get_coupons():
 
 # --- NEW: Start the background thread ---
 # We set daemon=True so the thread automatically exits when the main app stops
-coupon_thread = threading.Thread(target=run_coupon_scraper_loop, daemon=True)
-coupon_thread.start()
+# (Not in process-pool workers, see IS_WEB_PROCESS)
+if IS_WEB_PROCESS:
+    coupon_thread = threading.Thread(target=run_coupon_scraper_loop, daemon=True)
+    coupon_thread.start()
+    if prewarmer is not None:
+        prewarmer.start()
 # ------------------------------------
 
 if __name__ == "__main__":
@@ -0,0 +1,102 @@
+"""
+End-to-end latency benchmark for the search flow.
+
+Drives /api/search -> /api/search-status -> /api/products -> /api/recommend
+with several concurrent synthetic users and reports p50/p95/p99 per stage.
+
+For repeatable numbers run the server against recorded fixtures:
+
+    python scraper_replay.py record shoes shirt      # once, needs network
+    SMARTCART_SCRAPER_MODE=replay python app.py
+    python bench_search.py --users 8 --rounds 3 --queries shoes,shirt
+"""
+import argparse
+import concurrent.futures
+import threading
+import time
+from collections import defaultdict
+
+import numpy as np
+import requests
+
+_timings = defaultdict(list)
+_timings_lock = threading.Lock()
+
+
+def record(stage, seconds):
+    with _timings_lock:
+        _timings[stage].append(seconds * 1000)
+
+
+def timed(stage, func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    record(stage, time.perf_counter() - start)
+    return result
+
+
+def login(base_url, username, password='bench-password'):
+    """Returns a session logged in as a (possibly new) benchmark user."""
+    http = requests.Session()
+    http.post(f"{base_url}/signup", data={"username": username, "password": password})
+    http.post(f"{base_url}/login", data={"username": username, "password": password})
+    return http
+
+
+def run_user(base_url, user_index, queries, rounds, poll_interval, timeout):
+    http = login(base_url, f"bench_user_{user_index}")
+    for round_index in range(rounds):
+        query = queries[(user_index + round_index) % len(queries)]
+        started = time.perf_counter()
+        data = timed("search", http.get, f"{base_url}/api/search", params={"q": query}).json()
+
+        # Poll until the task finishes (cache misses only)
+        task_id = data.get("task_id")
+        deadline = started + timeout
+        cursor = 0
+        while data.get("status") in ("PENDING", "PROCESSING") and time.perf_counter() < deadline:
+            time.sleep(poll_interval)
+            data = timed("status", http.get, f"{base_url}/api/search-status/{task_id}",
+                         params={"since": cursor}).json()
+            cursor = data.get("cursor", cursor)
+
+        if data.get("status") != "SUCCESS":
+            print(f"user {user_index}: '{query}' did not finish ({data.get('status')}: {data.get('message')})")
+            continue
+        record("time_to_result", time.perf_counter() - started)
+
+        timed("products", http.get, f"{base_url}/api/products",
+              params={"q": query, "page": 2, "sort": "price_asc"})
+
+        products = data.get("products") or []
+        if products:
+            timed("recommend", http.get, f"{base_url}/api/recommend",
+                  params={"product_name": products[0]["Product Name"]})
+
+
+def report():
+    print(f"\n{'stage':<16}{'count':>7}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for stage, values in _timings.items():
+        p50, p95, p99 = np.percentile(values, [50, 95, 99])
+        print(f"{stage:<16}{len(values):>7}{p50:>10.1f}{p95:>10.1f}{p99:>10.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://127.0.0.1:5001")
+    parser.add_argument("--users", type=int, default=4, help="concurrent synthetic users")
+    parser.add_argument("--rounds", type=int, default=2, help="searches per user")
+    parser.add_argument("--queries", default="shoes,shirt,watch")
+    parser.add_argument("--poll-interval", type=float, default=0.5)
+    parser.add_argument("--timeout", type=float, default=180.0)
+    args = parser.parse_args()
+
+    queries = [q.strip() for q in args.queries.split(",") if q.strip()]
+    with concurrent.futures.ThreadPoolExecutor(max_workers=args.users) as pool:
+        futures = [
+            pool.submit(run_user, args.base_url, i, queries, args.rounds, args.poll_interval, args.timeout)
+            for i in range(args.users)
+        ]
+        for future in futures:
+            future.result()
+    report()
@@ -0,0 +1,103 @@
+"""
+Per-request session overhead benchmark.
+
+Runs a tiny Flask app under the test client with each session backend
+and reports the median extra cost per request over a request to the
+same app from a client that has no session at all:
+
+  read   a poll-style request that only reads user_id
+  write  a request that changes last_query
+
+Each round times one baseline, one read and one write request back to
+back, so the three see the same machine noise; the reported figure is
+the median of the paired differences, and the range is the spread of
+that median across repeats.
+
+    python bench_sessions.py --requests 2000 --repeats 5
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+from flask import Flask, session
+
+from session_store import SQLiteSessionInterface
+
+
+def make_app(backend, workdir):
+    app = Flask(__name__)
+    app.config["SECRET_KEY"] = "bench-secret"
+    if backend == "sqlite":
+        app.session_interface = SQLiteSessionInterface(os.path.join(workdir, "sessions.db"))
+    elif backend == "filesystem":
+        from flask_session import Session
+        app.config["SESSION_TYPE"] = "filesystem"
+        app.config["SESSION_FILE_DIR"] = os.path.join(workdir, "flask_session")
+        Session(app)
+
+    @app.route("/login")
+    def login():
+        session["user_id"] = 1
+        session["username"] = "bench"
+        return "ok"
+
+    @app.route("/none")
+    def no_session():
+        return "ok"
+
+    @app.route("/read")
+    def read():
+        return str(session.get("user_id"))
+
+    @app.route("/write/<query>")
+    def write(query):
+        session["last_query"] = query
+        return "ok"
+
+    return app
+
+
+def paired_us(app, n):
+    """
+    Medians of (read - baseline) and (write - baseline) over n interleaved
+    rounds, in microseconds. The baseline is /none from a cookieless client.
+    """
+    bare = app.test_client()
+    client = app.test_client()
+    client.get("/login")
+    requests = ((bare, "/none"), (client, "/read"), (client, "/write/q{i}"))
+    for i in range(min(n, 200)): # Warm up
+        for c, path in requests:
+            c.get(path.format(i=-i))
+    timings = np.empty((n, len(requests)))
+    for i in range(n):
+        for k in range(len(requests)):
+            j = (i + k) % len(requests) # Rotate the order so none of them always runs first
+            c, path = requests[j]
+            start = time.perf_counter()
+            c.get(path.format(i=i))
+            timings[i, j] = time.perf_counter() - start
+    diffs = timings[:, 1:] - timings[:, :1]
+    return tuple(float(v) * 1e6 for v in np.median(diffs, axis=0))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--backends", default="cookie,sqlite,filesystem")
+    args = parser.parse_args()
+
+    print(f"{'backend':<12}{'read +us':>10}{'(range)':>16} {'write +us':>10}{'(range)':>16}")
+    for backend in args.backends.split(","):
+        with tempfile.TemporaryDirectory() as workdir:
+            try:
+                app = make_app(backend, workdir)
+            except ImportError as e:
+                print(f"{backend:<12}skipped ({e})")
+                continue
+            runs = np.array([paired_us(app, args.requests) for _ in range(args.repeats)])
+            cells = [f"{np.median(column):>10.1f}{f'({column.min():.1f}..{column.max():.1f})':>16}" for column in runs.T]
+            print(f"{backend:<12}{' '.join(cells)}")
@@ -0,0 +1,193 @@
+import atexit
+import math
+import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
+
+from selenium import webdriver
+from selenium.webdriver.chrome.service import Service
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.support.ui import WebDriverWait
+from webdriver_manager.chrome import ChromeDriverManager
+
+from cdp_network import NetworkCapture, cdp_enabled, prepare_options
+
+# --- Pooled Chrome instances for the Selenium scrapers ---
+# Starting Chrome costs seconds per store per search, so browsers are kept
+# and leased out, one scraper at a time (WebDriver sessions aren't thread
+# safe). Inside a lease a scraper opens result pages 1..N in several tabs
+# at once: Chrome loads them concurrently and we read them in page order.
+# One browser per 'scrape' worker by default
+POOL_SIZE = int(os.environ.get('SMARTCART_BROWSERS', '4'))
+# Tabs loading at once within one browser
+MAX_TABS = 4
+# A browser is restarted after this many leases, so memory growth can't pile up
+BROWSER_MAX_LEASES = 50
+# How long a tab may take to show results before it counts as an empty page
+PAGE_READY_SECONDS = 20
+
+
+def _new_driver():
+    options = webdriver.ChromeOptions()
+    options.add_argument('--headless')
+    options.add_argument('--no-sandbox')
+    options.add_argument('--disable-dev-shm-usage')
+    options.add_argument('user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36')
+    options.add_argument('--start-maximized')
+    options.add_argument('--disable-blink-features=AutomationControlled')
+    options.add_experimental_option("excludeSwitches", ["enable-automation"])
+    options.add_experimental_option('useAutomationExtension', False)
+    prepare_options(options)
+    return webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=options)
+
+
+class BrowserPool:
+    """
+    Up to `size` Chrome instances, created on first use and reused across
+    searches. lease() hands one out with a single blank tab; a lease that
+    raises, or a browser that reached BROWSER_MAX_LEASES, is quit rather
+    than returned.
+    """
+
+    def __init__(self, size=POOL_SIZE, max_leases=BROWSER_MAX_LEASES):
+        self.max_leases = max_leases
+        self._slots = threading.BoundedSemaphore(size)
+        self._idle = queue.LifoQueue()
+        self._leases = {}
+
+    @contextmanager
+    def lease(self):
+        self._slots.acquire()
+        driver = None
+        healthy = False
+        try:
+            try:
+                driver = self._idle.get_nowait()
+            except queue.Empty:
+                driver = _new_driver()
+                self._leases[id(driver)] = 0
+            self._leases[id(driver)] += 1
+            yield driver
+            healthy = True
+        finally:
+            if driver is not None:
+                if healthy and self._leases[id(driver)] < self.max_leases and self._reset(driver):
+                    self._idle.put(driver)
+                else:
+                    self._quit(driver)
+            self._slots.release()
+
+    def _reset(self, driver):
+        """Closes every tab but one and blanks it. False if the browser is unusable."""
+        try:
+            handles = driver.window_handles
+            for handle in handles[1:]:
+                driver.switch_to.window(handle)
+                driver.close()
+            driver.switch_to.window(handles[0])
+            driver.get('about:blank')
+            if cdp_enabled():
+                driver.get_log('performance') # Don't bill this lease's traffic to the next one
+            return True
+        except Exception:
+            return False
+
+    def _quit(self, driver):
+        self._leases.pop(id(driver), None)
+        try:
+            driver.quit()
+        except Exception:
+            pass
+
+    def close(self):
+        while True:
+            try:
+                self._quit(self._idle.get_nowait())
+            except queue.Empty:
+                return
+
+
+def pages_for(max_items, page_size, default_pages, max_pages=10):
+    """How many result pages cover `max_items` (default_pages when there is no cap)."""
+    if not max_items:
+        return default_pages
+    return max(1, min(max_pages, math.ceil(max_items / page_size)))
+
+
+def open_tab(driver, url, store):
+    """
+    Opens `url` in a new tab with resource blocking and returns its handle
+    without waiting for the page to load.
+    """
+    driver.switch_to.new_window('tab')
+    NetworkCapture(driver, store) # Blocking is per tab, so set it before navigating
+    driver.execute_script("window.location.href = arguments[0];", url)
+    return driver.current_window_handle
+
+
+def scroll_for_items(driver, item_selector, max_items=None, deadline=None, attempts=5, pause=2):
+    """
+    Infinite-scroll loader for stores without page URLs: scrolls until the
+    page stops growing, `attempts` run out, the deadline passes, or
+    `max_items` cards (item_selector) are on the page.
+    """
+    last_height = driver.execute_script("return document.body.scrollHeight")
+    for _ in range(attempts):
+        if deadline and time.time() > deadline:
+            break
+        if max_items and len(driver.find_elements(By.CSS_SELECTOR, item_selector)) >= max_items:
+            break
+        driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
+        time.sleep(pause)
+        new_height = driver.execute_script("return document.body.scrollHeight")
+        if new_height == last_height:
+            break
+        last_height = new_height
+
+
+def scrape_pages(driver, urls, store, parse_page, ready_selector, max_items=None, deadline=None, tabs=MAX_TABS):
+    """
+    Loads `urls` (result pages in order) up to `tabs` at a time and calls
+    parse_page(driver, page_index) on each once `ready_selector` shows.
+    Products are deduped by URL. Stops after the page that reaches
+    `max_items`, at the deadline, or at the first page adding nothing new
+    (past the last page). Returns at most `max_items` products.
+    """
+    products, seen = [], set()
+    base = driver.current_window_handle
+    traffic = NetworkCapture(driver, store) # The network log covers every tab
+    done = False
+    for start in range(0, len(urls), tabs):
+        opened = [open_tab(driver, url, store) for url in urls[start:start + tabs]]
+        for offset, handle in enumerate(opened):
+            driver.switch_to.window(handle)
+            if not done:
+                new = 0
+                timeout = PAGE_READY_SECONDS if deadline is None else max(1, min(PAGE_READY_SECONDS, deadline - time.time()))
+                try:
+                    WebDriverWait(driver, timeout).until(EC.presence_of_element_located((By.CSS_SELECTOR, ready_selector)))
+                    for product in parse_page(driver, start + offset):
+                        key = product['Product URL'] or product['Product Name']
+                        if key not in seen:
+                            seen.add(key)
+                            products.append(product)
+                            new += 1
+                except Exception as e:
+                    print(f"{store}: page {start + offset + 1} gave no results ({type(e).__name__}).")
+                print(f"{store}: page {start + offset + 1}: {new} new products ({len(products)} total).")
+                done = (new == 0 or (max_items and len(products) >= max_items)
+                        or (deadline and time.time() > deadline))
+            driver.close() # Pages after the stopping point are closed unread
+        driver.switch_to.window(base)
+        if done:
+            break
+    traffic.summary()
+    return products[:max_items] if max_items else products
+
+
+# --- Shared pool; browsers are quit when the process exits ---
+pool = BrowserPool()
+atexit.register(pool.close)
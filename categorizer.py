@@ -0,0 +1,132 @@
+import json
+import os
+import re
+
+import numpy as np
+import pandas as pd
+
+# --- Optional: pyahocorasick gives a true single-pass automaton ---
+# Without it we fall back to one regex compiled from a keyword trie.
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
+RULES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'category_rules.json')
+
+
+def _trie_pattern(node):
+    """Regex for a keyword trie that prefers the longest keyword at each position."""
+    branches = [re.escape(char) + _trie_pattern(child) for char, child in sorted(node.items()) if char]
+    if not branches:
+        return ''
+    pattern = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+    if '' in node:
+        pattern = '(?:' + pattern + ')?' # Greedy: a longer keyword wins, else stop here
+    return pattern
+
+
+class Categorizer:
+    """
+    Keyword categorizer compiled once from an ordered rule list.
+    The first rule (in file order) with a keyword inside the name wins,
+    exactly like the old chain of `any(k in name ...)` checks.
+    """
+
+    def __init__(self, rules, default='Other'):
+        self.categories = [rule['category'] for rule in rules]
+        self.default = default
+        self.labels = np.array(self.categories + [default], dtype=object)
+
+        # keyword -> rank of the first category that lists it
+        self._rank = {}
+        for rank, rule in enumerate(rules):
+            for keyword in rule['keywords']:
+                keyword = keyword.lower()
+                if keyword and keyword not in self._rank:
+                    self._rank[keyword] = rank
+
+        self._automaton = None
+        self._pattern = None
+        if not self._rank:
+            return
+
+        if ahocorasick is not None:
+            self._automaton = ahocorasick.Automaton()
+            for keyword, rank in self._rank.items():
+                self._automaton.add_word(keyword, rank)
+            self._automaton.make_automaton()
+        else:
+            # A lookahead finds a hit at *every* position (overlaps included).
+            # The trie pattern reports the longest keyword starting there;
+            # every other keyword starting there is a prefix of it, so it maps
+            # to the best rank among its prefixes and the minimum over
+            # positions is exact. Cost per position follows keyword length,
+            # not how many rules there are.
+            trie = {}
+            for keyword in self._rank:
+                node = trie
+                for char in keyword:
+                    node = node.setdefault(char, {})
+                node[''] = True
+            self._pattern = re.compile('(?=(' + _trie_pattern(trie) + '))')
+            self._prefix_rank = {
+                keyword: min(self._rank.get(keyword[:end], rank) for end in range(1, len(keyword) + 1))
+                for keyword, rank in self._rank.items()
+            }
+
+    def _best_rank(self, lowered):
+        """Returns the winning rule index for a lowercased name, or the default index."""
+        if self._automaton is not None:
+            return min((rank for _, rank in self._automaton.iter(lowered)), default=len(self.categories))
+        if self._pattern is not None:
+            hits = self._pattern.findall(lowered)
+            if hits:
+                return min(map(self._prefix_rank.__getitem__, hits))
+        return len(self.categories)
+
+    def categorize(self, name):
+        """Categorizes a single product name."""
+        return self.labels[self._best_rank(name.lower())]
+
+    def categorize_batch(self, names):
+        """
+        Categorizes a whole column of product names in one pass.
+        Each distinct name is matched once; brand (first word) is taken
+        in the same loop. Returns (categories, brands) as Series aligned
+        with the input index.
+        """
+        if not isinstance(names, pd.Series):
+            names = pd.Series(names, dtype=object)
+
+        codes, uniques = pd.factorize(names.fillna('').astype(str))
+        rank_codes = np.empty(len(uniques), dtype=np.int32)
+        brands = np.empty(len(uniques), dtype=object)
+        for i, name in enumerate(uniques.tolist()):
+            rank_codes[i] = self._best_rank(name.lower())
+            brands[i] = name.partition(' ')[0]
+
+        categories = pd.Series(self.labels[rank_codes[codes]], index=names.index)
+        brand_col = pd.Series(brands[codes], index=names.index)
+        return categories, brand_col
+
+
+def load_rules(path=RULES_PATH):
+    """Builds a Categorizer from a JSON rules file."""
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+    return Categorizer(data['rules'], default=data.get('default', 'Other'))
+
+
+# --- Shared instance, compiled once at import ---
+default_categorizer = load_rules()
+
+
+def categorize_product(name):
+    """Simple heuristic to categorize a product."""
+    return default_categorizer.categorize(name)
+
+
+def categorize_batch(names):
+    """Vectorized categories + brands for a Series of product names."""
+    return default_categorizer.categorize_batch(names)
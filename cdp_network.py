@@ -0,0 +1,120 @@
+import base64
+import json
+import os
+import re
+
+# --- Chrome DevTools Protocol layer for the Selenium scrapers ---
+# Blocks requests the scrapers never look at (images, media, fonts,
+# analytics) and captures the stores' own listing JSON as it arrives, so
+# products can be parsed from structured data. DOM scraping stays as the
+# fallback. SMARTCART_CDP=0 turns all of it off.
+BLOCKED_URL_PATTERNS = [
+    # Images and media: the scrapers only read their URLs from the page
+    '*.jpg', '*.jpeg', '*.png', '*.gif', '*.webp', '*.avif', '*.svg', '*.ico',
+    '*.mp4', '*.webm', '*.m3u8', '*.mp3',
+    # Fonts
+    '*.woff', '*.woff2', '*.ttf', '*.otf', '*.eot',
+    # Analytics, tags and ads
+    '*google-analytics.com*', '*googletagmanager.com*', '*doubleclick.net*',
+    '*googlesyndication.com*', '*facebook.net*', '*connect.facebook.com*',
+    '*hotjar.com*', '*clevertap*', '*moengage*', '*branch.io*', '*appsflyer*',
+    '*newrelic.com*', '*nr-data.net*', '*segment.io*', '*criteo*', '*taboola*',
+]
+
+
+def cdp_enabled():
+    return os.environ.get('SMARTCART_CDP', '1') != '0'
+
+
+def prepare_options(options):
+    """Turns on the Chrome performance log the capture reads network events from."""
+    if cdp_enabled():
+        options.set_capability('goog:loggingPrefs', {'performance': 'ALL'})
+    return options
+
+
+class NetworkCapture:
+    """
+    Attached to a driver before the first page load. poll() drains the
+    performance log, counts bytes and blocked requests, and fetches the
+    bodies of JSON responses whose URL matches one of `capture_urls`.
+    If the driver doesn't support CDP, everything is a no-op and the
+    scraper just loads pages unfiltered.
+    """
+
+    def __init__(self, driver, store, capture_urls=()):
+        self.driver = driver
+        self.store = store
+        self.patterns = [re.compile(p) for p in capture_urls]
+        self.active = False
+        self.bodies = []
+        self.responses = 0
+        self.bytes = 0
+        self.blocked = 0
+        self._pending = {} # requestId -> url, for matching responses still loading
+        if not cdp_enabled():
+            return
+        try:
+            driver.execute_cdp_cmd('Network.enable', {})
+            driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': BLOCKED_URL_PATTERNS})
+            self.active = True
+        except Exception as e:
+            print(f"CDP: {store}: interception unavailable ({e}); loading pages unfiltered.")
+
+    def poll(self):
+        """Reads network events logged since the last poll; returns newly captured JSON bodies."""
+        if not self.active:
+            return []
+        try:
+            entries = self.driver.get_log('performance')
+        except Exception:
+            return []
+
+        finished = []
+        for entry in entries:
+            message = json.loads(entry['message'])['message']
+            method = message.get('method')
+            params = message.get('params', {})
+            if method == 'Network.responseReceived':
+                self.responses += 1
+                response = params['response']
+                if 'json' in response.get('mimeType', '') and any(p.search(response['url']) for p in self.patterns):
+                    self._pending[params['requestId']] = response['url']
+            elif method == 'Network.loadingFinished':
+                self.bytes += params.get('encodedDataLength', 0)
+                if params['requestId'] in self._pending:
+                    finished.append(params['requestId'])
+            elif method == 'Network.loadingFailed' and params.get('blockedReason'):
+                self.blocked += 1
+
+        captured = []
+        for request_id in finished:
+            url = self._pending.pop(request_id)
+            try:
+                body = self.driver.execute_cdp_cmd('Network.getResponseBody', {'requestId': request_id})
+                text = base64.b64decode(body['body']) if body.get('base64Encoded') else body['body']
+                captured.append(json.loads(text))
+            except Exception as e:
+                print(f"CDP: {self.store}: could not read {url}: {e}")
+        self.bodies.extend(captured)
+        return captured
+
+    def summary(self):
+        """Drains the log and prints what the page load cost."""
+        self.poll()
+        if self.active:
+            print(f"CDP: {self.store}: {self.responses} responses, {self.bytes // 1024} KB, "
+                  f"{self.blocked} blocked, {len(self.bodies)} listing payloads captured.")
+
+
+def choose(structured, dom_count, store):
+    """
+    Uses the structured products when they cover at least what the page
+    shows (dom_count cards); otherwise the caller should scrape the DOM.
+    """
+    if structured and len(structured) >= dom_count:
+        print(f"CDP: {store}: using {len(structured)} products from listing JSON.")
+        return structured
+    if structured:
+        print(f"CDP: {store}: listing JSON has {len(structured)} of {dom_count} products; scraping the DOM.")
+    return None
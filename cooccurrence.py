@@ -0,0 +1,143 @@
+import heapq
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+
+# --- Item-to-item co-occurrence graph ---
+# "Users who clicked X also clicked Y", built from the clicks and wishlist
+# tables and kept up to date by reading only the rows added since the last
+# sync, so no retraining or full rescan. Clicks are append-only; wishlist
+# rows can be deleted, which a sync spots by counting the rows it has seen.
+DB_PATH = 'user_history.db'
+# A wishlist add says more than a click
+CLICK_WEIGHT = 1
+WISHLIST_WEIGHT = 2
+# Lookups pick up other workers' events at most this stale
+SYNC_INTERVAL_SECONDS = 5
+
+
+class CoOccurrenceGraph:
+    """
+    Weighted adjacency table over product names. The weight of (x, y) is
+    the sum over users of min(weight of x, weight of y) for that user,
+    where an item's weight is the strongest event the user had with it
+    (click or wishlist). Adding an event only touches the pairs involving
+    that user's items, and lookups are a dict access plus a top-k.
+    """
+
+    def __init__(self, db_path=DB_PATH):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._ids = {}                     # product name -> item id
+        self._names = []                   # item id -> product name
+        self._users = defaultdict(dict)    # user_id -> {item id: weight}
+        self._adjacency = defaultdict(dict)  # item id -> {item id: weight}
+        self._clicked = set()              # (user_id, item id) pairs with a click
+        self._wishlisted = {}              # wishlist row id -> (user_id, item id)
+        self._last_click_id = 0
+        self._last_wishlist_id = 0
+        self._last_sync = 0.0
+
+    def _item(self, name):
+        item = self._ids.get(name)
+        if item is None:
+            item = self._ids[name] = len(self._names)
+            self._names.append(name)
+        return item
+
+    def add_event(self, user_id, product_name, weight=CLICK_WEIGHT):
+        """Applies one event; repeats and weaker events than before change nothing."""
+        with self._lock:
+            item = self._item(product_name)
+            if weight > self._users[user_id].get(item, 0):
+                self._set_weight(user_id, item, weight)
+
+    def _set_weight(self, user_id, item, weight):
+        """Moves a user's weight for an item up or down, adjusting its pairs. Caller holds _lock."""
+        seen = self._users[user_id]
+        old = seen.get(item, 0)
+        for other, other_weight in seen.items():
+            if other == item:
+                continue
+            delta = min(weight, other_weight) - min(old, other_weight)
+            if delta:
+                for a, b in ((item, other), (other, item)):
+                    row = self._adjacency[a]
+                    row[b] = row.get(b, 0) + delta
+                    if not row[b]:
+                        del row[b]
+        if weight:
+            seen[item] = weight
+        else:
+            seen.pop(item, None)
+
+    def _remove_wishlist(self, row_ids):
+        """Drops deleted wishlist rows; the item falls back to a click if the user clicked it."""
+        with self._lock:
+            for row_id in row_ids:
+                user_id, item = self._wishlisted.pop(row_id)
+                if any(entry == (user_id, item) for entry in self._wishlisted.values()):
+                    continue # Still wishlisted under another URL
+                self._set_weight(user_id, item, CLICK_WEIGHT if (user_id, item) in self._clicked else 0)
+
+    def sync(self):
+        """Applies click and wishlist rows added (or wishlist rows deleted) since the last sync. Returns how many."""
+        with self._sync_lock:
+            conn = None
+            self._last_sync = time.time()
+            removed = []
+            try:
+                conn = sqlite3.connect(self.db_path, check_same_thread=False)
+                clicks = conn.execute('SELECT id, user_id, product_name FROM clicks WHERE id > ? ORDER BY id',
+                                      (self._last_click_id,)).fetchall()
+                wishlist = conn.execute('SELECT id, user_id, product_name FROM wishlist WHERE id > ? ORDER BY id',
+                                        (self._last_wishlist_id,)).fetchall()
+                kept = conn.execute('SELECT COUNT(*) FROM wishlist WHERE id <= ?', (self._last_wishlist_id,)).fetchone()[0]
+                if kept < len(self._wishlisted):
+                    live = {row_id for row_id, in conn.execute('SELECT id FROM wishlist WHERE id <= ?',
+                                                              (self._last_wishlist_id,))}
+                    removed = [row_id for row_id in self._wishlisted if row_id not in live]
+            except sqlite3.Error as e:
+                print(f"CO-OCCURRENCE: Sync failed: {e}")
+                return 0
+            finally:
+                if conn:
+                    conn.close()
+            for _, user_id, product_name in clicks:
+                self.add_event(user_id, product_name, CLICK_WEIGHT)
+                self._clicked.add((user_id, self._ids[product_name]))
+            for row_id, user_id, product_name in wishlist:
+                self.add_event(user_id, product_name, WISHLIST_WEIGHT)
+                self._wishlisted[row_id] = (user_id, self._ids[product_name])
+            if removed:
+                self._remove_wishlist(removed)
+            if clicks:
+                self._last_click_id = clicks[-1][0]
+            if wishlist:
+                self._last_wishlist_id = wishlist[-1][0]
+            return len(clicks) + len(wishlist) + len(removed)
+
+    def related(self, product_name, limit=20):
+        """[(product name, weight), ...] most co-occurring with `product_name`, strongest first."""
+        if time.time() - self._last_sync > SYNC_INTERVAL_SECONDS:
+            self.sync()
+        with self._lock:
+            item = self._ids.get(product_name)
+            if item is None:
+                return []
+            top = heapq.nlargest(limit, self._adjacency[item].items(), key=lambda pair: pair[1])
+            return [(self._names[other], weight) for other, weight in top]
+
+    def stats(self):
+        with self._lock:
+            return {
+                "items": len(self._names),
+                "users": len(self._users),
+                "edges": sum(len(row) for row in self._adjacency.values()) // 2,
+            }
+
+
+# --- Shared instance; the first lookup loads the full history once ---
+graph = CoOccurrenceGraph()
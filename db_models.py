@@ -83,7 +83,19 @@ def create_tables():
         UNIQUE(store, code)
     )
     ''')
-    
+
+    # Search log (written in batches by search_log.SearchLog), feeds the prewarmer
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS searches (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER,
+        query TEXT NOT NULL,
+        normalized_query TEXT NOT NULL,
+        cache_hit INTEGER NOT NULL,
+        timestamp REAL NOT NULL
+    )
+    ''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_searches_time ON searches (timestamp)")
 
     conn.commit()
     conn.close()
@@ -238,6 +250,39 @@ def log_price(product):
         if conn:
             conn.close()
 
+def log_searches(rows):
+    """Writes a batch of (user_id, query, normalized_query, cache_hit, timestamp) search rows."""
+    conn = None
+    try:
+        conn = sqlite3.connect('user_history.db', check_same_thread=False)
+        conn.executemany(
+            "INSERT INTO searches (user_id, query, normalized_query, cache_hit, timestamp) VALUES (?, ?, ?, ?, ?)",
+            rows
+        )
+        conn.commit()
+    except sqlite3.Error as e:
+        print(f"Database error (log_searches): {e}")
+    finally:
+        if conn:
+            conn.close()
+
+def get_searches(after_id=0, since=0):
+    """(id, normalized_query, timestamp) for searches with id > after_id and timestamp > since, oldest first."""
+    conn = None
+    try:
+        conn = sqlite3.connect('user_history.db', check_same_thread=False)
+        cursor = conn.execute(
+            "SELECT id, normalized_query, timestamp FROM searches WHERE id > ? AND timestamp > ? ORDER BY id",
+            (after_id, since)
+        )
+        return cursor.fetchall()
+    except sqlite3.Error as e:
+        print(f"Database error (get_searches): {e}")
+        return []
+    finally:
+        if conn:
+            conn.close()
+
 def get_tracked_items(user_id):
     """Retrieves all products a user is tracking."""
     try:
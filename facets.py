@@ -0,0 +1,133 @@
+import numpy as np
+import pandas as pd
+
+from product_matching import group_rows
+
+# Facet name (as used in the API) -> DataFrame column
+FACET_COLUMNS = {
+    'store': 'Store',
+    'brand': 'Brand',
+    'category': 'Category',
+}
+
+# Facets a product matches through any of its listings: it is in every store that sells it
+OFFER_FACETS = ('store',)
+
+SORT_ORDERS = ('relevance', 'price_asc', 'price_desc', 'name')
+
+DEFAULT_PAGE_SIZE = 48
+MAX_PAGE_SIZE = 200
+
+
+class FacetIndex:
+    """
+    Precomputed filter/sort structures over one cached result DataFrame.
+    Every facet column is stored as integer codes, and every sort order
+    as a permutation, so a query is a few NumPy mask operations plus a
+    slice of the page we actually return. Pages and counts list one row
+    per product (Group): its cheapest listing, whose Offers carry the
+    other stores.
+    """
+
+    def __init__(self, df):
+        self.df = df
+        self.price = df['Price'].to_numpy()
+        # group id per row, the listed (cheapest) row per group, and a mask of listed rows
+        self.groups, self.group_rows = group_rows(df)
+        self.listed = np.zeros(len(df), dtype=bool)
+        self.listed[self.group_rows] = True
+
+        # Plain per-column arrays, so a page can be serialized without to_dict
+        self.columns = tuple(df.columns)
+        self.arrays = [df[column].to_numpy() for column in self.columns]
+
+        self.codes = {}
+        self.values = {}
+        self.lookup = {}
+        for facet, column in FACET_COLUMNS.items():
+            if isinstance(df[column].dtype, pd.CategoricalDtype):
+                # Categorical columns already carry their codes
+                codes, uniques = df[column].cat.codes.to_numpy(), df[column].cat.categories
+            else:
+                codes, uniques = pd.factorize(df[column], sort=True)
+            self.codes[facet] = codes
+            self.values[facet] = [str(v) for v in uniques]
+            self.lookup[facet] = {v: i for i, v in enumerate(self.values[facet])}
+
+        # Row x value matrices for OFFER_FACETS: every listing's value marks its whole group
+        self.membership = {}
+        for facet in OFFER_FACETS:
+            by_group = np.zeros((len(self.group_rows), len(self.values[facet])), dtype=bool)
+            by_group[self.groups, self.codes[facet]] = True
+            self.membership[facet] = by_group[self.groups]
+
+        # Products rank where their first listing did
+        first_seen = np.full(len(self.group_rows), len(df))
+        np.minimum.at(first_seen, self.groups, np.arange(len(df)))
+        self.orders = {
+            'relevance': self.group_rows[np.argsort(first_seen, kind='stable')],
+            'price_asc': np.argsort(self.price, kind='stable'),
+            'price_desc': np.argsort(-self.price, kind='stable'),
+            'name': np.argsort(df['Product Name'].to_numpy(dtype=str), kind='stable'),
+        }
+
+    def _facet_mask(self, facet, selected):
+        """Boolean row mask for 'value in selected' on one facet, or None if unfiltered."""
+        if not selected:
+            return None
+        allowed = np.zeros(len(self.values[facet]), dtype=bool)
+        lookup = self.lookup[facet]
+        allowed[[lookup[v] for v in selected if v in lookup]] = True
+        if facet in self.membership:
+            return self.membership[facet][:, allowed].any(axis=1)
+        return allowed[self.codes[facet]]
+
+    def query(self, min_price=None, max_price=None, selected=None, sort='relevance', page=1, limit=DEFAULT_PAGE_SIZE):
+        """
+        Filters, sorts and pages the cached results.
+        `selected` maps facet name -> list of accepted values.
+        Returns the matching row positions for the page (see `payloads`).
+        Facet counts are disjunctive: each facet is counted with every
+        *other* filter applied, so the sidebar still shows alternatives.
+        """
+        selected = selected or {}
+        limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+        page = max(1, int(page))
+
+        base = self.listed.copy()
+        if min_price is not None:
+            base &= self.price >= min_price
+        if max_price is not None:
+            base &= self.price <= max_price
+
+        facet_masks = {facet: self._facet_mask(facet, selected.get(facet)) for facet in FACET_COLUMNS}
+
+        mask = base.copy()
+        for facet_mask in facet_masks.values():
+            if facet_mask is not None:
+                mask &= facet_mask
+
+        facet_counts = {}
+        for facet in FACET_COLUMNS:
+            others = base.copy()
+            for other, facet_mask in facet_masks.items():
+                if other != facet and facet_mask is not None:
+                    others &= facet_mask
+            if facet in self.membership:
+                counts = self.membership[facet][others].sum(axis=0)
+            else:
+                counts = np.bincount(self.codes[facet][others], minlength=len(self.values[facet]))
+            facet_counts[facet] = {v: int(c) for v, c in zip(self.values[facet], counts) if c}
+
+        order = self.orders[sort]
+        matching = order[mask[order]]
+        start = (page - 1) * limit
+        rows = matching[start:start + limit]
+
+        return {
+            "rows": rows,
+            "total": int(len(matching)),
+            "page": page,
+            "limit": limit,
+            "facets": facet_counts,
+        }
@@ -0,0 +1,99 @@
+import asyncio
+import random
+import threading
+import time
+
+import aiohttp
+
+# --- Shared asyncio HTTP client for the HTTP scraping path ---
+# One event loop thread holds every in-flight page request, so fetching
+# hundreds of result pages doesn't cost a thread (or a browser) each.
+MAX_CONNECTIONS = 100
+# Concurrent connections to any single store
+PER_HOST_CONCURRENCY = 6
+# Idle keep-alive connections are reused for this long
+KEEPALIVE_SECONDS = 30
+REQUEST_TIMEOUT_SECONDS = 15
+# Retries for connection errors and these statuses, with exponential backoff + jitter
+MAX_RETRIES = 3
+BACKOFF_BASE_SECONDS = 0.5
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+USER_AGENT = ('Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 '
+              '(KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36')
+
+
+class FetchEngine:
+    """
+    Runs an asyncio event loop in a dedicated daemon thread with one
+    keep-alive, connection-pooled aiohttp session. Flask threads hand it
+    coroutines through submit() and get a concurrent.futures.Future back.
+    The loop and session start on first use.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._loop = None
+        self._session = None
+
+    def _start(self):
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="fetch-engine", daemon=True).start()
+                self._session = asyncio.run_coroutine_threadsafe(self._open_session(), loop).result()
+                self._loop = loop
+                print("FETCH ENGINE: Event loop started.")
+        return self._loop
+
+    async def _open_session(self):
+        connector = aiohttp.TCPConnector(limit=MAX_CONNECTIONS, limit_per_host=PER_HOST_CONCURRENCY,
+                                         keepalive_timeout=KEEPALIVE_SECONDS, ttl_dns_cache=300)
+        return aiohttp.ClientSession(connector=connector,
+                                     timeout=aiohttp.ClientTimeout(total=REQUEST_TIMEOUT_SECONDS),
+                                     headers={'User-Agent': USER_AGENT})
+
+    def submit(self, coro):
+        """Schedules a coroutine on the engine's loop; returns a concurrent Future."""
+        return asyncio.run_coroutine_threadsafe(coro, self._start())
+
+    async def fetch(self, url, deadline=None, binary=False):
+        """
+        GETs one page and returns its text (bytes if `binary`), or None for
+        an error status other than RETRY_STATUSES, after MAX_RETRIES failed
+        attempts, or once `deadline` (epoch seconds) has passed.
+        """
+        for attempt in range(MAX_RETRIES + 1):
+            if deadline and time.time() >= deadline:
+                return None
+            try:
+                async with self._session.get(url) as response:
+                    if response.status in RETRY_STATUSES:
+                        error = f"HTTP {response.status}"
+                    elif response.status >= 400:
+                        # Retrying won't change a 404 or 403
+                        print(f"FETCH ENGINE: {url}: HTTP {response.status}")
+                        return None
+                    else:
+                        return await (response.read() if binary else response.text())
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                error = str(e) or type(e).__name__
+            if attempt == MAX_RETRIES:
+                print(f"FETCH ENGINE: Giving up on {url}: {error}")
+                return None
+            delay = BACKOFF_BASE_SECONDS * 2 ** attempt * (0.5 + random.random())
+            if deadline:
+                delay = min(delay, max(0.0, deadline - time.time()))
+            await asyncio.sleep(delay)
+
+    async def fetch_all(self, urls, deadline=None):
+        """Fetches all URLs concurrently; returns texts (None for failures) in order."""
+        return await asyncio.gather(*(self.fetch(url, deadline) for url in urls))
+
+    def close(self):
+        if self._loop is not None:
+            asyncio.run_coroutine_threadsafe(self._session.close(), self._loop).result()
+            self._loop.call_soon_threadsafe(self._loop.stop)
+
+
+# --- Shared instance ---
+engine = FetchEngine()
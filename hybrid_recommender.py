@@ -0,0 +1,185 @@
+import time
+
+import numpy as np
+
+import cooccurrence
+from recommender import NEIGHBOURS_K
+
+# --- Hybrid recommender ---
+# Every source proposes candidate rows; every candidate is then scored by
+# every source that can score it, and one weighted blend picks the top k.
+# Candidates are products, not listings: each is collapsed to its Group's
+# listed row, and the clicked product's own Group is left out.
+SOURCE_WEIGHTS = {
+    "ai": 0.35,        # learned embedding similarity (once the model is trained)
+    "name": 0.35,      # TF-IDF name similarity
+    "category": 0.15,  # same category, close in price
+    "coclick": 0.15,   # clicked or wishlisted by the same users
+}
+# Candidates each source may propose
+CANDIDATES_PER_SOURCE = 20
+# "Close in price" for the category source: within this fraction of the clicked price
+PRICE_BAND = 0.3
+# Sources still pending once this much time has passed are skipped
+RECOMMEND_BUDGET_SECONDS = 0.05
+
+
+class _Source:
+    """A candidate generator and scorer. Scores are in [0, 1]."""
+    name = None
+
+    def available(self, entry):
+        return True
+
+    def candidates(self, ctx):
+        raise NotImplementedError
+
+    def score(self, ctx, rows):
+        raise NotImplementedError
+
+
+class EmbeddingSource(_Source):
+    name = "ai"
+
+    def available(self, entry):
+        return "ai" in entry.neighbours and entry.model is not None
+
+    def candidates(self, ctx):
+        return ctx.entry.neighbours["ai"][ctx.row]
+
+    def score(self, ctx, rows):
+        embeddings, product_to_id, _ = ctx.entry.model
+        names = ctx.entry.facets.arrays[ctx.entry.facets.columns.index('Product Name')]
+        ids = np.array([product_to_id.get(name, 0) for name in names[np.append(rows, ctx.row)].tolist()])
+        vectors = np.asarray(embeddings)[ids]
+        norms = np.linalg.norm(vectors, axis=1)
+        norms[norms == 0] = 1
+        vectors = vectors / norms[:, None]
+        return np.clip(vectors[:-1] @ vectors[-1], 0, 1)
+
+
+class NameSource(_Source):
+    name = "name"
+
+    def available(self, entry):
+        return "name" in entry.neighbours and entry.name_index is not None
+
+    def candidates(self, ctx):
+        return ctx.entry.neighbours["name"][ctx.row]
+
+    def score(self, ctx, rows):
+        index = ctx.entry.name_index
+        return (index[rows] @ index[ctx.row].T).toarray().ravel()
+
+
+class CategorySource(_Source):
+    name = "category"
+
+    def _proximity(self, ctx, rows):
+        facets = ctx.entry.facets
+        codes = facets.codes["category"]
+        price = facets.price[ctx.row]
+        distance = np.abs(facets.price[rows].astype(np.float64) - price) / max(price * PRICE_BAND, 1)
+        return np.where(codes[rows] == codes[ctx.row], np.clip(1 - distance, 0, 1), 0.0)
+
+    def candidates(self, ctx):
+        facets = ctx.entry.facets
+        rows = np.flatnonzero(facets.listed & (facets.codes["category"] == facets.codes["category"][ctx.row]))
+        closeness = self._proximity(ctx, rows)
+        rows, closeness = rows[closeness > 0], closeness[closeness > 0]
+        if len(rows) > CANDIDATES_PER_SOURCE:
+            rows = rows[np.argpartition(-closeness, CANDIDATES_PER_SOURCE - 1)[:CANDIDATES_PER_SOURCE]]
+        return rows
+
+    def score(self, ctx, rows):
+        return self._proximity(ctx, rows)
+
+
+class CoClickSource(_Source):
+    name = "coclick"
+
+    def _counts(self, ctx):
+        if "coclick" not in ctx.cache:
+            counts = {}
+            for name, weight in cooccurrence.graph.related(ctx.product_name, CANDIDATES_PER_SOURCE * 5):
+                row = ctx.entry.row_of(name)
+                if row is not None:
+                    counts[row] = weight
+            ctx.cache["coclick"] = counts
+        return ctx.cache["coclick"]
+
+    def candidates(self, ctx):
+        counts = self._counts(ctx)
+        return np.array(sorted(counts, key=counts.get, reverse=True)[:CANDIDATES_PER_SOURCE], dtype=np.int64)
+
+    def score(self, ctx, rows):
+        counts = self._counts(ctx)
+        if not counts:
+            return np.zeros(len(rows))
+        return np.array([counts.get(r, 0) for r in rows.tolist()], dtype=np.float64) / max(counts.values())
+
+
+# Cheapest first, so a tight budget still gets the in-memory sources
+SOURCES = [EmbeddingSource(), NameSource(), CategorySource(), CoClickSource()]
+
+
+class _Context:
+    __slots__ = ('entry', 'row', 'product_name', 'cache')
+
+    def __init__(self, entry, row, product_name):
+        self.entry = entry
+        self.row = row
+        self.product_name = product_name
+        self.cache = {}
+
+
+def recommend(entry, row, product_name, k=NEIGHBOURS_K, weights=SOURCE_WEIGHTS, sources=SOURCES,
+              budget=RECOMMEND_BUDGET_SECONDS):
+    """
+    Blends all available sources into one ranked top-k for a clicked row.
+    Returns (rows, blended scores, {source: per-row scores}, skipped sources).
+    """
+    started = time.perf_counter()
+    ctx = _Context(entry, row, product_name)
+    active, skipped, proposed = [], [], []
+    for source in sources:
+        if weights.get(source.name, 0) <= 0 or not source.available(entry):
+            continue
+        if time.perf_counter() - started > budget:
+            skipped.append(source.name)
+            continue
+        active.append(source)
+        proposed.append(np.asarray(source.candidates(ctx), dtype=np.int64))
+
+    # One row per product: drop the clicked product's listings, collapse the rest to their listed row
+    candidates = np.concatenate(proposed) if proposed else np.zeros(0, dtype=np.int64)
+    groups = entry.facets.groups
+    candidates = candidates[candidates >= 0]
+    candidates = candidates[groups[candidates] != groups[row]]
+    candidates = np.unique(entry.facets.group_rows[groups[candidates]])
+    if len(candidates) == 0:
+        return candidates, np.zeros(0), {}, skipped
+
+    # One column per source, one weighted blend. The budget holds here too:
+    # a source is skipped once it is spent, and a column that took us past
+    # it is dropped (unless it is the only one)
+    columns, scored = [], []
+    for source in active:
+        if time.perf_counter() - started > budget:
+            skipped.append(source.name)
+            continue
+        column = source.score(ctx, candidates)
+        if time.perf_counter() - started > budget and scored:
+            skipped.append(source.name)
+            continue
+        columns.append(column)
+        scored.append(source)
+    if not scored:
+        return np.zeros(0, dtype=np.int64), np.zeros(0), {}, skipped
+    matrix = np.column_stack(columns)
+    blend = matrix @ np.array([weights[source.name] for source in scored])
+
+    top = np.argsort(-blend, kind='stable')[:k]
+    top = top[blend[top] > 0]
+    per_source = {source.name: matrix[top, i] for i, source in enumerate(scored)}
+    return candidates[top], blend[top], per_source, skipped
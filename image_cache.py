@@ -0,0 +1,244 @@
+import hashlib
+import io
+import os
+import sqlite3
+import threading
+import time
+
+from fetch_engine import engine as fetch_engine
+
+# --- Optional: Pillow for resized WebP/JPEG thumbnails ---
+# Without it the proxy still fetches each image once and caches the original bytes.
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+# --- Local image proxy with an on-disk thumbnail cache ---
+# Scraped 'Image URL's are rewritten to /img/<hash>. The first request for
+# a hash fetches the store image, shrinks it and stores it; after that it
+# is served from disk with long-lived cache headers. The hash -> URL map
+# and the LRU bookkeeping live in one SQLite table shared by all workers.
+DEFAULT_CACHE_DIR = os.environ.get('SMARTCART_IMAGE_CACHE', 'image_cache')
+# Total thumbnail bytes on disk; least recently used files go first
+MAX_CACHE_BYTES = 512 * 1024 * 1024
+# Eviction trims to this fraction of the limit, so it doesn't run on every store
+EVICT_TO = 0.9
+# Thumbnails fit in this box (the result grid shows them at ~250px)
+THUMBNAIL_SIZE = (400, 400)
+WEBP_QUALITY = 80
+JPEG_QUALITY = 82
+# How long an image fetch may take before we give up (the route then redirects to the original)
+FETCH_TIMEOUT_SECONDS = 10
+# A hit only rewrites its last-access time when it is older than this
+TOUCH_INTERVAL_SECONDS = 60
+# Rows for images with nothing on disk (evicted, or never requested) are
+# forgotten after this long unused; a new scrape registers them again
+FORGET_AFTER_SECONDS = 7 * 24 * 3600
+# How often a process looks for such rows
+PRUNE_INTERVAL_SECONDS = 3600
+PROXY_PREFIX = '/img/'
+# File suffixes a cached image may have ('orig' = unresized bytes, without Pillow)
+FORMATS = ('webp', 'jpg', 'orig')
+SIGNATURES = ((b'\xff\xd8', 'image/jpeg'), (b'\x89PNG', 'image/png'), (b'GIF8', 'image/gif'), (b'WEBP', 'image/webp'))
+
+
+class ImageUnavailable(Exception):
+    """Raised when an image couldn't be fetched or decoded; carries the original URL."""
+
+    def __init__(self, url):
+        super().__init__(url)
+        self.url = url
+
+
+def image_hash(url):
+    return hashlib.sha1(url.encode('utf-8')).hexdigest()[:24]
+
+
+class ImageCache:
+    """
+    Thumbnails on disk as <hash>.webp (or .jpg for clients without WebP),
+    bounded to max_bytes by least-recent access. Each image is fetched at
+    most once at a time per process (concurrent requests for the same hash
+    wait for the first); the second format is re-encoded from the first.
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=MAX_CACHE_BYTES):
+        self.cache_dir = os.path.abspath(cache_dir)
+        self.max_bytes = max_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+        self._local = threading.local()
+        self._locks = {}
+        self._locks_lock = threading.Lock()
+        self._last_prune = 0.0
+        self._conn().executescript('''
+        CREATE TABLE IF NOT EXISTS images (
+            hash TEXT PRIMARY KEY,
+            url TEXT NOT NULL,
+            size INTEGER NOT NULL DEFAULT 0,
+            last_access REAL NOT NULL DEFAULT 0
+        );
+        CREATE INDEX IF NOT EXISTS idx_images_lru ON images (last_access) WHERE size > 0;
+        ''')
+        # Rows registered before registration set last_access count from now, not 1970
+        self._conn().execute('UPDATE images SET last_access = ? WHERE last_access = 0', (time.time(),))
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(os.path.join(self.cache_dir, 'images.db'), timeout=10, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def rewrite(self, products):
+        """
+        Points each product's 'Image URL' at the proxy, registering the
+        originals in one write (which also keeps their rows from being pruned).
+        """
+        now = time.time()
+        rows = []
+        for product in products:
+            url = product.get('Image URL')
+            if url and url.startswith(('http://', 'https://')):
+                key = image_hash(url)
+                rows.append((key, url, now, TOUCH_INTERVAL_SECONDS))
+                product['Image URL'] = PROXY_PREFIX + key
+        if rows:
+            self._conn().executemany(
+                'INSERT INTO images (hash, url, last_access) VALUES (?, ?, ?) '
+                'ON CONFLICT(hash) DO UPDATE SET last_access = excluded.last_access '
+                'WHERE images.last_access < excluded.last_access - ?', rows)
+        if now - self._last_prune > PRUNE_INTERVAL_SECONDS:
+            self._last_prune = now
+            self.prune()
+        return products
+
+    def _path(self, key, fmt):
+        return os.path.join(self.cache_dir, f'{key}.{fmt}')
+
+    def thumbnail(self, key, webp=True):
+        """
+        (path, mimetype) of the cached thumbnail for `key`, fetching and
+        storing it first if needed. Raises KeyError for an unknown hash and
+        ImageUnavailable if the store image can't be fetched.
+        """
+        row = self._conn().execute('SELECT url, size, last_access FROM images WHERE hash = ?', (key,)).fetchone()
+        if row is None:
+            raise KeyError(key)
+        url, size, last_access = row
+        fmt = 'orig' if Image is None else 'webp' if webp else 'jpg'
+        path = self._path(key, fmt)
+        if size and os.path.exists(path):
+            if time.time() - last_access > TOUCH_INTERVAL_SECONDS:
+                self._conn().execute('UPDATE images SET last_access = ? WHERE hash = ?', (time.time(), key))
+            return path, self._mimetype(path)
+
+        with self._lock_for(key):
+            try:
+                if not os.path.exists(path):
+                    self._store(key, url, fmt)
+            finally:
+                self._pop_lock(key)
+        return path, self._mimetype(path)
+
+    def _lock_for(self, key):
+        with self._locks_lock:
+            return self._locks.setdefault(key, threading.Lock())
+
+    def _source(self, key, fmt):
+        """Bytes of another format already cached for `key` (re-encoded instead of fetching the origin again), or None."""
+        for other in FORMATS:
+            if other != fmt:
+                try:
+                    with open(self._path(key, other), 'rb') as f:
+                        return f.read()
+                except OSError:
+                    pass
+        return None
+
+    def _store(self, key, url, fmt):
+        data = self._source(key, fmt)
+        if not data:
+            future = fetch_engine.submit(fetch_engine.fetch(url, time.time() + FETCH_TIMEOUT_SECONDS, binary=True))
+            try:
+                data = future.result(timeout=FETCH_TIMEOUT_SECONDS + 1)
+            except Exception:
+                data = None
+        if not data:
+            raise ImageUnavailable(url)
+
+        if Image is not None:
+            try:
+                image = Image.open(io.BytesIO(data))
+                image.thumbnail(THUMBNAIL_SIZE)
+                out = io.BytesIO()
+                if fmt == 'webp':
+                    image.save(out, 'WEBP', quality=WEBP_QUALITY, method=4)
+                else:
+                    image.convert('RGB').save(out, 'JPEG', quality=JPEG_QUALITY, optimize=True, progressive=True)
+                data = out.getvalue()
+            except Exception:
+                raise ImageUnavailable(url)
+
+        tmp = f'{self._path(key, fmt)}.{os.getpid()}.tmp'
+        with open(tmp, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, self._path(key, fmt)) # Readers never see a half-written file
+
+        paths = [self._path(key, f) for f in FORMATS]
+        size = sum(os.path.getsize(p) for p in paths if os.path.exists(p))
+        self._conn().execute('UPDATE images SET size = ?, last_access = ? WHERE hash = ?', (size, time.time(), key))
+        self.evict()
+
+    def _pop_lock(self, key):
+        with self._locks_lock:
+            self._locks.pop(key, None)
+
+    def _mimetype(self, path):
+        if path.endswith('.webp'):
+            return 'image/webp'
+        if path.endswith('.jpg'):
+            return 'image/jpeg'
+        with open(path, 'rb') as f: # Original bytes: go by the file signature
+            head = f.read(12)
+        for signature, mimetype in SIGNATURES:
+            if head.startswith(signature) or (signature == b'WEBP' and head[8:12] == b'WEBP'):
+                return mimetype
+        return 'application/octet-stream'
+
+    def evict(self):
+        """Deletes least recently used thumbnails until the cache is under its limit. Returns bytes freed."""
+        conn = self._conn()
+        total = conn.execute('SELECT COALESCE(SUM(size), 0) FROM images').fetchone()[0]
+        if total <= self.max_bytes:
+            return 0
+        freed = 0
+        target = total - self.max_bytes * EVICT_TO
+        for key, size in conn.execute('SELECT hash, size FROM images WHERE size > 0 ORDER BY last_access').fetchall():
+            if freed >= target:
+                break
+            for fmt in FORMATS:
+                try:
+                    os.remove(self._path(key, fmt))
+                except FileNotFoundError:
+                    pass
+            # Keep the row: the URL mapping is what lets a later request fetch it again
+            conn.execute('UPDATE images SET size = 0 WHERE hash = ?', (key,))
+            freed += size
+        print(f"IMAGE CACHE: Evicted {freed // 1024} KB (limit {self.max_bytes // (1024 * 1024)} MB).")
+        return freed
+
+    def prune(self):
+        """Forgets rows with nothing on disk that haven't been used for FORGET_AFTER_SECONDS. Returns how many."""
+        deleted = self._conn().execute('DELETE FROM images WHERE size = 0 AND last_access < ?',
+                                       (time.time() - FORGET_AFTER_SECONDS,)).rowcount
+        if deleted:
+            print(f"IMAGE CACHE: Forgot {deleted} unused image rows.")
+        return deleted
+
+    def stats(self):
+        count, total = self._conn().execute(
+            'SELECT COUNT(*), COALESCE(SUM(size), 0) FROM images WHERE size > 0').fetchone()
+        return {"cached_images": count, "bytes": total, "limit_bytes": self.max_bytes}
@@ -0,0 +1,68 @@
+import gzip
+from functools import lru_cache
+
+import msgspec
+
+# --- Optional: brotli for smaller pre-compressed bodies ---
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Bodies smaller than this aren't worth compressing
+MIN_COMPRESS_SIZE = 1024
+# Pre-compress cached bodies (gzip, plus brotli when installed)
+PRECOMPRESS = True
+
+_encoder = msgspec.json.Encoder()
+
+
+@lru_cache(maxsize=32)
+def _row_struct(columns):
+    """A msgspec Struct whose JSON keys are the DataFrame column names."""
+    fields = [(f'f{i}', object) for i in range(len(columns))]
+    rename = {f'f{i}': column for i, column in enumerate(columns)}
+    return msgspec.defstruct('ProductRow', fields, rename=rename)
+
+
+def products(facets, rows):
+    """
+    Builds the product list for a page straight from the cached column
+    arrays. Structs encode several times faster than per-row dicts.
+    """
+    row_type = _row_struct(facets.columns)
+    columns = [array[rows].tolist() for array in facets.arrays]
+    return [row_type(*values) for values in zip(*columns)]
+
+
+def records(facets, rows, **extra):
+    """A few rows as plain dicts, with `extra` keys added to each (e.g. rec_type)."""
+    columns = [array[rows].tolist() for array in facets.arrays]
+    return [dict(zip(facets.columns, values), **extra) for values in zip(*columns)]
+
+
+def encode(obj):
+    """Encodes a response payload to JSON bytes."""
+    return _encoder.encode(obj)
+
+
+class EncodedBody:
+    """An encoded JSON body, optionally pre-compressed once for reuse."""
+    __slots__ = ('raw', 'gzip', 'br')
+
+    def __init__(self, raw, precompress=PRECOMPRESS):
+        self.raw = raw
+        self.gzip = None
+        self.br = None
+        if precompress and len(raw) >= MIN_COMPRESS_SIZE:
+            self.gzip = gzip.compress(raw, compresslevel=6)
+            if brotli is not None:
+                self.br = brotli.compress(raw, quality=5)
+
+    def select(self, accept_encoding):
+        """Returns (body, content_encoding) for a request's Accept-Encoding header."""
+        if self.br is not None and 'br' in accept_encoding:
+            return self.br, 'br'
+        if self.gzip is not None and 'gzip' in accept_encoding:
+            return self.gzip, 'gzip'
+        return self.raw, None
@@ -0,0 +1,152 @@
+import os
+import threading
+import time
+from collections import deque
+
+# --- Popularity-driven cache prewarming ---
+# Popular queries are re-scraped in the background shortly before their
+# cached result goes stale (or after it was evicted / the server
+# restarted), so the people who search them next get a cache hit instead
+# of a cold multi-store scrape. Only runs in off-peak hours, while the
+# scrape queue is quiet, one search at a time and within a browser budget.
+# How many of the most popular queries are kept warm
+TOP_N = int(os.environ.get('SMARTCART_PREWARM_TOP', '20'))
+# Off-peak hours (server local time) prewarming may run in, end-exclusive:
+# "1-7", "1-7,14-16", "22-6", or "0-24" for any time. Default 01:00-06:59
+PREWARM_HOURS = os.environ.get('SMARTCART_PREWARM_HOURS', '1-7')
+# Browser-seconds prewarming may spend per rolling hour
+BROWSER_BUDGET_SECONDS = int(os.environ.get('SMARTCART_PREWARM_BUDGET', '1200'))
+# Refresh a result this long before it would go stale
+REFRESH_MARGIN_SECONDS = 30 * 60
+# A query needs at least this decayed search count to be worth a scrape
+MIN_SCORE = 1.0
+# How often the prewarmer looks for work
+CHECK_INTERVAL_SECONDS = 30
+
+
+def parse_hours(spec):
+    """The set of hours (0-23) in a spec like "1-7,22-2" (ranges are end-exclusive and may wrap)."""
+    hours = set()
+    for part in spec.split(','):
+        part = part.strip()
+        if not part:
+            continue
+        start, _, end = part.partition('-')
+        start = int(start) % 24
+        end = (int(end) if end else start + 1)
+        span = (end - start) % 24 or (24 if end != start else 0)
+        hours.update((start + i) % 24 for i in range(span))
+    return hours
+
+
+class Prewarmer:
+    """
+    Background loop that keeps the top `top_n` queries of a
+    search_log.PopularityModel fresh in the result cache. The app supplies
+    the hooks:
+      dispatch(query) -> task id (or None)   starts a background search
+      running(task_id) -> bool               that search hasn't published yet
+      cache_age(query) -> seconds or None    age of the newest cached result (any worker's)
+      busy() -> bool                         users are keeping the scrapers busy
+      cost() -> browser-seconds              what one search costs
+    """
+
+    def __init__(self, popularity, dispatch, running, cache_age, busy, cost, ttl,
+                 top_n=TOP_N, hours=PREWARM_HOURS, budget=BROWSER_BUDGET_SECONDS,
+                 refresh_margin=REFRESH_MARGIN_SECONDS, interval=CHECK_INTERVAL_SECONDS):
+        self.popularity = popularity
+        self.dispatch = dispatch
+        self.running = running
+        self.cache_age = cache_age
+        self.busy = busy
+        self.cost = cost
+        self.ttl = ttl
+        self.top_n = top_n
+        self.hours = parse_hours(hours)
+        self.budget = budget
+        self.refresh_margin = min(refresh_margin, ttl / 2)
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._spent = deque() # (time, browser-seconds) charged in the last hour
+        self._attempts = {}   # query -> last dispatch time
+        self._in_flight = None # (query, task id)
+        self.prewarmed = 0
+
+    def start(self):
+        thread = threading.Thread(target=self._loop, daemon=True)
+        thread.start()
+        return thread
+
+    def _loop(self):
+        print(f"PREWARM: Keeping the top {self.top_n} queries warm "
+              f"(hours {sorted(self.hours)}, {self.budget} browser-seconds/hour).")
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.tick()
+            except Exception as e:
+                print(f"PREWARM: Error: {e}")
+
+    def spent(self):
+        """Browser-seconds charged in the last hour."""
+        cutoff = time.time() - 3600
+        with self._lock:
+            while self._spent and self._spent[0][0] < cutoff:
+                self._spent.popleft()
+            return sum(seconds for _, seconds in self._spent)
+
+    def due(self):
+        """Popular queries whose cached result is missing or about to go stale, most popular first."""
+        now = time.time()
+        due = []
+        for query, score in self.popularity.top(self.top_n):
+            if score < MIN_SCORE:
+                break
+            if now - self._attempts.get(query, 0) < self.refresh_margin:
+                continue # Just tried it (it may have found nothing)
+            age = self.cache_age(query)
+            if age is None or age > self.ttl - self.refresh_margin:
+                due.append((query, score, age))
+        return due
+
+    def tick(self):
+        """Starts at most one prewarm search. Returns its query, or None."""
+        if self._in_flight is not None:
+            if self.running(self._in_flight[1]):
+                return None
+            self._in_flight = None
+        if time.localtime().tm_hour not in self.hours or self.busy():
+            return None
+
+        self.popularity.sync()
+        due = self.due()
+        if not due:
+            return None
+        cost = self.cost()
+        if self.spent() + cost > self.budget:
+            return None
+
+        query, score, age = due[0]
+        self._attempts[query] = time.time()
+        task_id = self.dispatch(query)
+        if task_id is None:
+            return None
+        with self._lock:
+            self._spent.append((time.time(), cost))
+        self._in_flight = (query, task_id)
+        self.prewarmed += 1
+        age = 'not cached' if age is None else f"{age / 60:.0f} min old"
+        print(f"PREWARM: Refreshing '{query}' (popularity {score:.1f}, {age}), task {task_id}. "
+              f"{len(due) - 1} more due.")
+        return query
+
+    def stats(self):
+        return {
+            "tracked_queries": len(self.popularity),
+            "due": len(self.due()),
+            "in_flight": self._in_flight[0] if self._in_flight else None,
+            "prewarmed": self.prewarmed,
+            "budget_seconds": self.budget,
+            "spent_last_hour_seconds": round(self.spent(), 1),
+            "hours": sorted(self.hours),
+        }
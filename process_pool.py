@@ -0,0 +1,141 @@
+import atexit
+import concurrent.futures
+import mmap
+import multiprocessing
+import os
+import pickle
+import tempfile
+import threading
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+
+from facets import FacetIndex
+from product_matching import match_products
+from recommender import build_name_index, train_dl_model, top_k_neighbours, embedding_neighbours
+
+# --- Worker processes for CPU-heavy stages ---
+# Cross-store matching, facet/TF-IDF indexing and model training run here instead of in
+# Flask's threads, so they don't hold the GIL against request handling and a
+# TensorFlow crash or memory spike only takes down a worker.
+PROCESS_WORKERS = 2
+# Recycle workers now and then so TensorFlow memory growth can't accumulate
+MAX_TASKS_PER_CHILD = 20
+# Results come back through files here; /dev/shm is RAM-backed shared memory
+SPILL_DIR = '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = concurrent.futures.ProcessPoolExecutor(
+                max_workers=PROCESS_WORKERS,
+                mp_context=multiprocessing.get_context('spawn'),
+                max_tasks_per_child=MAX_TASKS_PER_CHILD,
+            )
+        return _pool
+
+
+def run(fn, *args):
+    """
+    Runs fn(*args) in a worker process and waits for the result.
+    If a worker dies, the broken pool is dropped so the next call gets a fresh one.
+    """
+    global _pool
+    pool = _get_pool()
+    try:
+        return pool.submit(fn, *args).result()
+    except BrokenProcessPool:
+        with _pool_lock:
+            if _pool is pool:
+                _pool = None
+        pool.shutdown(wait=False)
+        raise
+
+
+@atexit.register
+def _shutdown():
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+
+
+# --- Passing results through shared memory ---
+def spill(obj):
+    """Pickles obj into a shared-memory file and returns its path."""
+    fd, path = tempfile.mkstemp(prefix='smartcart-', suffix='.pkl', dir=SPILL_DIR)
+    with os.fdopen(fd, 'wb') as f:
+        pickle.dump(obj, f, protocol=pickle.HIGHEST_PROTOCOL)
+    return path
+
+
+def load_spilled(path):
+    """Memory-maps and unpickles a spilled object, then removes the file."""
+    try:
+        with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+            return pickle.loads(buf)
+    finally:
+        os.unlink(path)
+
+
+def spill_array(array):
+    fd, path = tempfile.mkstemp(prefix='smartcart-', suffix='.npy', dir=SPILL_DIR)
+    with os.fdopen(fd, 'wb') as f:
+        np.save(f, array)
+    return path
+
+
+def load_array(path):
+    """Maps a spilled array read-only (zero copy); the mapping outlives the unlinked file."""
+    try:
+        return np.load(path, mmap_mode='r')
+    finally:
+        os.unlink(path)
+
+
+# --- Jobs that run inside the worker process ---
+def _build_indexes(df):
+    df = match_products(df)
+    name_index = build_name_index(df)
+    facets = FacetIndex(df)
+    return spill({
+        "df": df,
+        "facets": facets,
+        "name_index": name_index,
+        "neighbours": {"name": top_k_neighbours(name_index, groups=facets.groups, group_rows=facets.group_rows)}
+                      if name_index is not None else {},
+    })
+
+
+def _train_embeddings(df):
+    model, product_to_id, max_length = train_dl_model(df)
+    if model is None:
+        return None, None, None, None
+    embeddings = model.layers[0].get_weights()[0]
+    neighbours = embedding_neighbours(df, embeddings, product_to_id)
+    return spill_array(embeddings), product_to_id, max_length, neighbours
+
+
+# --- Called from the web process ---
+def build_indexes(df):
+    """
+    Groups cross-store listings of the same product (adding the match
+    columns to the table) and builds the facet index, TF-IDF name index
+    and name-similarity neighbour table. Returns a dict with the updated df.
+    """
+    return load_spilled(run(_build_indexes, df))
+
+
+def train_embeddings(df):
+    """
+    Trains the DL model in a worker. Returns ((embedding_matrix, product_to_id,
+    max_length), neighbours) where neighbours is the embedding-similarity
+    table for df's rows; (None, None) if there wasn't enough data.
+    """
+    path, product_to_id, max_length, neighbours = run(_train_embeddings, df)
+    if path is None:
+        return None, None
+    return (load_array(path), product_to_id, max_length), neighbours
@@ -0,0 +1,154 @@
+import math
+import re
+
+import numpy as np
+import pandas as pd
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+# --- Cross-store product matching ---
+# Listings are only compared inside a block (brand + category + price
+# bucket + model numbers), so the work grows with block sizes rather than n^2.
+# Neighbouring price buckets differ by this factor
+PRICE_BUCKET_RATIO = 1.5
+# Cosine similarity of the char n-gram vectors needed to call two listings the same product
+MATCH_THRESHOLD = 0.75
+# Added to the product table by match_products()
+MATCH_COLUMNS = ('Group', 'Offers', 'Cheapest Store', 'Cheapest Price')
+
+_NON_ALNUM = re.compile(r'[^a-z0-9]+')
+# Tokens with a digit in them: model numbers ("Pegasus 40", "574"), pack sizes
+_NUMBER_TOKEN = re.compile(r'\b\w*\d\w*\b')
+
+
+def _number_key(name):
+    return ' '.join(sorted(set(_NUMBER_TOKEN.findall(name.lower()))))
+
+
+def _same_name_links(df, stores):
+    """
+    (left, right) row pairs listed under the same normalized name by
+    different stores. These are the same product whatever their price,
+    so they are linked without going through the blocks.
+    """
+    names = df['Product Name'].str.lower().str.replace(_NON_ALNUM, ' ', regex=True).str.split().str.join(' ')
+    codes, _ = pd.factorize(names)
+    order = np.lexsort((stores, codes))
+    same = np.flatnonzero((codes[order][1:] == codes[order][:-1]) & (stores[order][1:] != stores[order][:-1]))
+    return order[same], order[same + 1]
+
+
+def blocking_keys(df):
+    """
+    Integer block id per row: (brand token, category, log price bucket,
+    numeric tokens). Listings with different model numbers are never
+    the same product, and splitting on them keeps blocks small.
+    """
+    brand = df['Brand'].astype(str).str.lower().to_numpy()
+    buckets = np.floor(np.log(np.maximum(df['Price'].to_numpy(), 1)) / math.log(PRICE_BUCKET_RATIO)).astype(np.int32)
+    numbers = [_number_key(name) for name in df['Product Name'].tolist()]
+    keys = pd.MultiIndex.from_arrays([brand, df['Category'].astype(str).to_numpy(), buckets, numbers])
+    codes, _ = pd.factorize(keys)
+    return codes
+
+
+def match_groups(df):
+    """
+    Returns a canonical product id per row. Rows from different stores
+    with the same normalized name, or whose names are similar enough
+    (char 3-4 gram TF-IDF) within the same block, share an id; everything
+    else is its own group.
+    """
+    n = len(df)
+    if n == 0:
+        return np.zeros(0, dtype=np.int32)
+    blocks = blocking_keys(df)
+    stores = df['Store'].cat.codes.to_numpy() if isinstance(df['Store'].dtype, pd.CategoricalDtype) \
+        else pd.factorize(df['Store'])[0]
+
+    same_left, same_right = _same_name_links(df, stores)
+    left, right = [same_left], [same_right]
+
+    # Only blocks with listings from more than one store can produce a match
+    per_block = pd.DataFrame({'block': blocks, 'store': stores}).groupby('block')['store'].nunique()
+    candidate_blocks = per_block.index[per_block.to_numpy() > 1].to_numpy()
+    candidates = np.flatnonzero(np.isin(blocks, candidate_blocks))
+    if len(candidates) == 0:
+        return _components(n, left, right)
+
+    vectors = TfidfVectorizer(analyzer='char_wb', ngram_range=(3, 4), lowercase=True) \
+        .fit_transform(df['Product Name'].to_numpy()[candidates])
+
+    order = np.argsort(blocks[candidates], kind='stable')
+    bounds = np.flatnonzero(np.diff(blocks[candidates][order])) + 1
+    for members in np.split(order, bounds):
+        if len(members) < 2:
+            continue
+        similarity = (vectors[members] @ vectors[members].T).toarray()
+        i, j = np.nonzero(np.triu(similarity >= MATCH_THRESHOLD, k=1))
+        cross_store = stores[candidates[members[i]]] != stores[candidates[members[j]]]
+        left.append(candidates[members[i[cross_store]]])
+        right.append(candidates[members[j[cross_store]]])
+
+    return _components(n, left, right)
+
+
+def _components(n, left, right):
+    """Group id per row: connected components of the (left, right) links."""
+    left, right = np.concatenate(left), np.concatenate(right)
+    if len(left) == 0:
+        return np.arange(n, dtype=np.int32)
+    graph = coo_matrix((np.ones(len(left), dtype=np.int8), (left, right)), shape=(n, n))
+    _, groups = connected_components(graph, directed=False)
+    return groups.astype(np.int32)
+
+
+def cheapest_rows(groups, prices):
+    """Row of each group's cheapest listing (the first on a tie), indexed by group id."""
+    order = np.lexsort((prices, groups))
+    first = order[np.r_[True, groups[order][1:] != groups[order][:-1]]] if len(order) else order
+    cheapest = np.empty(groups.max() + 1 if len(groups) else 0, dtype=np.int64)
+    cheapest[groups[first]] = first
+    return cheapest
+
+
+def group_rows(df):
+    """
+    (group id per row, cheapest row per group id) for a product table;
+    without match columns every row is its own group.
+    """
+    if 'Group' not in df:
+        rows = np.arange(len(df))
+        return rows, rows
+    groups = df['Group'].to_numpy()
+    return groups, cheapest_rows(groups, df['Price'].to_numpy())
+
+
+def match_products(df):
+    """
+    Adds the MATCH_COLUMNS to a product table: the canonical product id,
+    the group's per-store offers (each store's cheapest listing as
+    {Store, Price, Product URL}, cheapest first), and the cheapest store
+    and price among them. Rows of one group share a single offers list.
+    """
+    groups = match_groups(df)
+    prices = df['Price'].to_numpy()
+    stores = df['Store'].to_numpy()
+    urls = df['Product URL'].to_numpy()
+    cheapest = cheapest_rows(groups, prices)
+    order = np.lexsort((prices, groups))
+
+    offers = {}
+    for i in order.tolist():
+        by_store = offers.setdefault(groups[i], {})
+        if stores[i] not in by_store:
+            by_store[stores[i]] = {'Store': stores[i], 'Price': int(prices[i]), 'Product URL': urls[i]}
+    offers = {group: list(by_store.values()) for group, by_store in offers.items()}
+
+    df['Group'] = groups
+    df['Offers'] = pd.Series([offers[group] for group in groups.tolist()], index=df.index, dtype=object)
+    df['Cheapest Store'] = df['Store'].to_numpy()[cheapest[groups]]
+    df['Cheapest Store'] = df['Cheapest Store'].astype(df['Store'].dtype)
+    df['Cheapest Price'] = prices[cheapest[groups]]
+    return df
@@ -0,0 +1,113 @@
+import re
+import threading
+from sys import intern
+
+import numpy as np
+import pandas as pd
+
+from categorizer import categorize_batch
+
+_NON_ALNUM = re.compile(r'[^a-z0-9]+')
+
+
+# Display columns of the product table, in order
+COLUMNS = ('Product Name', 'Price', 'Image URL', 'Product URL', 'Store', 'Category', 'Brand')
+
+
+def normalize_name(name):
+    """Dedupe key for a product name: lowercased, punctuation and extra spaces removed."""
+    return ' '.join(_NON_ALNUM.sub(' ', name.lower()).split())
+
+
+class ProductAccumulator:
+    """
+    Streaming merge stage for one search. Each scraper batch is cleaned
+    as it arrives: zero-price rows dropped, duplicates (same URL as
+    anything seen before, or same normalized name from the same store)
+    skipped, and the rest categorized. The same name from another store
+    is kept: product_matching groups those into one product's offers. Columns, price bounds and facet values are
+    kept up to date, so freeze() only has to wrap them in a DataFrame.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._seen = set()  # hashes of (store, normalized name) and URLs
+        self._columns = {column: [] for column in COLUMNS}
+        self.min_price = None
+        self.max_price = None
+        self.stores = set()
+        self.brands = set()
+        self.categories = set()
+
+    def __len__(self):
+        return len(self._columns['Product Name'])
+
+    def add(self, records):
+        """Merges one batch of raw scraper records; returns the cleaned new ones."""
+        added = []
+        with self._lock:
+            for record in records:
+                price = int(record.get('Price') or 0)
+                if price <= 0:
+                    continue
+                name = record.get('Product Name') or ''
+                url = record.get('Product URL') or ''
+                name_key = hash((record.get('Store'), normalize_name(name)))
+                url_key = hash(url) if url else None
+                if name_key in self._seen or url_key in self._seen:
+                    continue
+                self._seen.add(name_key)
+                if url_key is not None:
+                    self._seen.add(url_key)
+                added.append({
+                    'Product Name': intern(name),
+                    'Price': price,
+                    'Image URL': intern(record.get('Image URL') or ''),
+                    'Product URL': intern(url),
+                    'Store': record.get('Store'),
+                })
+            if not added:
+                return added
+
+            # Category and brand for the whole batch in one categorizer pass
+            categories, brands = categorize_batch([product['Product Name'] for product in added])
+            columns = self._columns
+            for product, category, brand in zip(added, categories.tolist(), brands.tolist()):
+                product['Category'] = category
+                product['Brand'] = brand
+                for column in COLUMNS:
+                    columns[column].append(product[column])
+                price = product['Price']
+                self.min_price = price if self.min_price is None else min(self.min_price, price)
+                self.max_price = price if self.max_price is None else max(self.max_price, price)
+                self.stores.add(product['Store'])
+                self.brands.add(brand)
+                self.categories.add(category)
+        return added
+
+    def freeze(self):
+        """
+        Returns (df, filters) for everything merged so far: the compact
+        product table (Price as int32; Store, Category and Brand as
+        categoricals) and the sidebar filter options.
+        """
+        with self._lock:
+            columns = {column: list(values) for column, values in self._columns.items()}
+            filters = {
+                "stores": sorted(self.stores),
+                "brands": sorted(self.brands),
+                "categories": sorted(self.categories),
+                "minPrice": self.min_price,
+                "maxPrice": self.max_price,
+            }
+        df = pd.DataFrame({
+            'Product Name': pd.Series(columns['Product Name'], dtype=object),
+            'Price': np.array(columns['Price'], dtype=np.int32),
+            'Image URL': pd.Series(columns['Image URL'], dtype=object),
+            'Product URL': pd.Series(columns['Product URL'], dtype=object),
+            'Store': pd.Categorical(columns['Store']),
+            'Category': pd.Categorical(columns['Category']),
+            'Brand': pd.Categorical(columns['Brand']),
+        })
+        return df, filters
+
@@ -1,44 +1,82 @@
 import pandas as pd
 import numpy as np
-import tensorflow as tf
 import sqlite3
+from scipy import sparse
 
 # --- Imports for Content-Based Similarity ---
 from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import linear_kernel
 # ------------------------------------------------
 
-from tensorflow.keras.models import Sequential
-from tensorflow.keras.layers import Embedding, LSTM, Dense, Dropout
-from tensorflow.keras.preprocessing.sequence import pad_sequences
+from product_matching import group_rows
+
+# TensorFlow is imported inside train_dl_model only, so the web process
+# (which just reads embedding matrices) never has to load it.
+
+# Neighbours precomputed per product, and rows scored per block (bounds memory to block x n)
+NEIGHBOURS_K = 5
+NEIGHBOUR_BLOCK_ROWS = 512
+
+# --- Precomputed neighbour tables ---
+def top_k_neighbours(vectors, k=NEIGHBOURS_K, block_rows=NEIGHBOUR_BLOCK_ROWS, groups=None, group_rows=None):
+    """
+    For every row of `vectors` (sparse or dense), the k other rows with the
+    highest dot product, best first, as an (n, k) int32 array. Rows are
+    scored a block at a time and cut down with argpartition, so the full
+    n x n matrix never exists. Missing slots (n <= k) are -1.
+
+    With `groups` (group id per row) and `group_rows` (the row listed for
+    each group id), neighbours are whole products instead: a group scores
+    as its best-matching row, a row's own group is left out, and each
+    group appears once, as its listed row.
+    """
+    n = vectors.shape[0]
+    neighbours = np.full((n, k), -1, dtype=np.int32)
+    if groups is not None:
+        # Columns sorted by group, so each group's best score is one reduceat
+        by_group = np.argsort(groups, kind='stable')
+        bounds = np.r_[0, np.flatnonzero(np.diff(groups[by_group])) + 1]
+        ids = groups[by_group][bounds] if n else groups
+    k_found = min(k, (len(ids) if groups is not None else n) - 1)
+    if k_found <= 0:
+        return neighbours
+    transposed = vectors.T.tocsr() if sparse.issparse(vectors) else vectors.T
+    for start in range(0, n, block_rows):
+        stop = min(start + block_rows, n)
+        scores = vectors[start:stop] @ transposed
+        scores = scores.toarray() if sparse.issparse(scores) else np.array(scores, dtype=np.float64)
+        if groups is None:
+            scores[np.arange(stop - start), np.arange(start, stop)] = -np.inf # Never your own neighbour
+        else:
+            scores = np.maximum.reduceat(scores[:, by_group], bounds, axis=1)
+            scores[np.arange(stop - start), np.searchsorted(ids, groups[start:stop])] = -np.inf
+        top = np.argpartition(-scores, k_found - 1, axis=1)[:, :k_found]
+        order = np.argsort(-np.take_along_axis(scores, top, axis=1), axis=1, kind='stable')
+        top = np.take_along_axis(top, order, axis=1)
+        neighbours[start:stop, :k_found] = top if groups is None else group_rows[ids[top]]
+    return neighbours
+
+def embedding_neighbours(df, embedding_matrix, product_to_id, k=NEIGHBOURS_K):
+    """
+    Top-k neighbours of every row of `df` by learned embedding (dot product),
+    among the products of `df` (see top_k_neighbours). Returns an (n, k) int32 array.
+    """
+    ids = np.array([product_to_id.get(name, 0) for name in df['Product Name'].tolist()], dtype=np.int64)
+    groups, listed = group_rows(df)
+    return top_k_neighbours(np.asarray(embedding_matrix)[ids], k, groups=groups, group_rows=listed)
 
 # --- Content-Based Recommender (Brought Back) ---
-def get_recommendations(title, df):
+def build_name_index(df):
     """
-    Gets simple content-based recommendations based on name similarity.
+    Fits the TF-IDF matrix over product names once per result set.
+    Returns None if there isn't enough data to compare.
     """
-    if df.empty or title not in df['Product Name'].values:
-        return pd.DataFrame()
-    
-    # Check if we have enough data to build a matrix
     if df.shape[0] < 2:
-        return pd.DataFrame()
-        
+        return None
     tfidf = TfidfVectorizer(stop_words='english')
-    # Use fit_transform on the 'Product Name' column
-    tfidf_matrix = tfidf.fit_transform(df['Product Name'].values.astype('U'))
-
-    cosine_sim = linear_kernel(tfidf_matrix, tfidf_matrix)
-    
     try:
-        idx = df[df['Product Name'] == title].index[0]
-        sim_scores = list(enumerate(cosine_sim[idx]))
-        sim_scores = sorted(sim_scores, key=lambda x: x[1], reverse=True)
-        sim_scores = sim_scores[1:6] # Get top 5
-        product_indices = [i[0] for i in sim_scores]
-        return df.iloc[product_indices]
-    except (IndexError, KeyError):
-        return pd.DataFrame()
+        return tfidf.fit_transform(df['Product Name'].values.astype('U'))
+    except ValueError: # Only stop words / empty names
+        return None
 
 # --- AI Model Training (With Dropout to reduce bias) ---
 def train_dl_model(all_products_df):
@@ -46,6 +84,10 @@ def train_dl_model(all_products_df):
     Trains the Deep Learning model based on all user interactions
     (clicks and wishlist).
     """
+    from tensorflow.keras.models import Sequential
+    from tensorflow.keras.layers import Embedding, LSTM, Dense, Dropout
+    from tensorflow.keras.preprocessing.sequence import pad_sequences
+
     try:
         conn = sqlite3.connect('user_history.db')
         query = """
@@ -110,74 +152,3 @@ def train_dl_model(all_products_df):
     
     print("DL Model training complete.")
     return model, product_to_id, max_length
-
-# --- AI Model Prediction (NEW: Using Embedding Similarity) ---
-def get_dl_recommendation_from_trained_model(selected_product_name, df, model, product_to_id, max_length):
-    """
-    Uses the model's learned Embeddings to find conceptually similar items.
-    """
-    
-    print(f"\n[DEBUG] Finding AI similarity for: {selected_product_name}")
-    
-    if model is None or selected_product_name not in product_to_id:
-        print("[DEBUG] Model is None or selected product is not in vocab.")
-        return pd.DataFrame()
-        
-    try:
-        # 1. Get all embedding vectors from the model
-        # This is a matrix where row 'i' is the vector for product ID 'i'
-        embedding_matrix = model.layers[0].get_weights()[0]
-        
-        # 2. Get the ID and vector for the product we clicked
-        input_id = product_to_id.get(selected_product_name)
-        if not input_id:
-            print("[DEBUG] Could not find input_id for product.")
-            return pd.DataFrame()
-        
-        input_vector = embedding_matrix[input_id]
-        
-        # 3. Calculate cosine similarity between our input vector and ALL other vectors
-        # This gives a similarity score for every product in the vocab
-        sim_scores = linear_kernel(input_vector.reshape(1, -1), embedding_matrix)[0]
-
-        # 4. Get the Top 6 indices (Top 1 will be the item itself)
-        top_indices = np.argsort(sim_scores)[-6:][::-1]
-        
-        # 5. Create reverse mapping
-        id_to_product = {i: name for name, i in product_to_id.items()}
-        
-        print("[DEBUG] AI Top 5 Similar (by vector):")
-        
-        relevant_predictions = []
-        
-        for i, product_id in enumerate(top_indices):
-            # 0 is padding, ignore
-            if product_id == 0:
-                continue
-                
-            predicted_name = id_to_product.get(product_id)
-            
-            # Ignore the item we just clicked (which will be Rank 1)
-            if not predicted_name or predicted_name == selected_product_name:
-                continue
-            
-            print(f"  - (Rank {i}) '{predicted_name}' (Score: {sim_scores[product_id]:.4f})")
-
-            # Check if this prediction is in our current search results
-            if predicted_name in df['Product Name'].values:
-                print(f"[DEBUG] Found a relevant prediction: '{predicted_name}'")
-                relevant_predictions.append(predicted_name)
-        
-        if not relevant_predictions:
-            print("[DEBUG] Top 5 similar products were all filtered out.")
-            return pd.DataFrame()
-            
-        print(f"[DEBUG] Success. Returning {len(relevant_predictions)} AI recommendations.")
-        # Return a DataFrame of all unique relevant predictions
-        return df[df['Product Name'].isin(list(set(relevant_predictions)))]
-            
-    except (ValueError, IndexError) as e:
-        print(f"[DEBUG] Error during DL prediction: {e}")
-        return pd.DataFrame()
-        
-    return pd.DataFrame()
\ No newline at end of file
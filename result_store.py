@@ -0,0 +1,232 @@
+import threading
+import time
+
+# How many distinct queries we keep cached
+MAX_CACHED_QUERIES = 50
+# A user pointer that hasn't been touched for this long no longer pins its entry
+POINTER_TTL_SECONDS = 30 * 60
+# Encoded response bodies kept per entry (first page + recent filter views)
+MAX_CACHED_BODIES = 32
+
+
+def normalize_query(query):
+    """Cache key for a search: lowercased, whitespace-collapsed."""
+    return ' '.join(query.lower().split())
+
+
+class ResultEntry:
+    """One processed search result, shared by every user who ran that query."""
+    __slots__ = ('query', 'version', 'df', 'filters', 'facets', 'name_index', 'store_status', 'model',
+                 'neighbours', 'max_items', 'refs', 'created_at', 'shared_version', 'checked_at', 'last_access', 'bodies', '_bodies_lock', '_rows')
+
+    def __init__(self, query, version, df, filters, facets, name_index, store_status, model, neighbours):
+        self.query = query
+        self.version = version
+        self.df = df
+        self.filters = filters
+        self.facets = facets
+        self.name_index = name_index
+        self.store_status = store_status or {}
+        self.model = model
+        # kind ('name', 'ai') -> (n, k) int32 array of neighbour row positions
+        self.neighbours = dict(neighbours or {})
+        # Per-store product cap the result was scraped with (None: unknown)
+        self.max_items = None
+        self.refs = 0
+        self.created_at = time.time()
+        # Version in the shared state backend, and when this worker last compared against it
+        self.shared_version = None
+        self.checked_at = 0.0
+        self.last_access = self.created_at
+        self.bodies = {}
+        self._bodies_lock = threading.Lock()
+        self._rows = None
+
+    def row_of(self, name):
+        """Row position of a product name, or None."""
+        if self._rows is None:
+            self._rows = {n: i for i, n in enumerate(self.df['Product Name'].tolist())}
+        return self._rows.get(name)
+
+    def cached_body(self, key, build):
+        """
+        Returns the encoded response body for `key`, building it once.
+        Entries are immutable per version, so bodies never go stale.
+        Least recently used bodies are dropped first.
+        """
+        with self._bodies_lock:
+            body = self.bodies.pop(key, None)
+            if body is not None:
+                self.bodies[key] = body
+                return body
+        # Built outside the lock; two threads may both build, the last one wins
+        body = build()
+        with self._bodies_lock:
+            self.bodies.pop(key, None)
+            while len(self.bodies) >= MAX_CACHED_BODIES:
+                self.bodies.pop(next(iter(self.bodies)))
+            self.bodies[key] = body
+        return body
+
+
+class ResultStore:
+    """
+    Shared, versioned result cache.
+
+    Each query has one *current* entry; refreshing a query creates a new
+    version. Users hold a lightweight pointer (query, version) instead of
+    their own DataFrame reference. Pointers are reference counts: a
+    superseded version stays alive only while some user still points at
+    it, and LRU eviction of current entries skips pinned ones. Memory
+    therefore grows with distinct queries, not with users.
+    """
+
+    def __init__(self, max_queries=MAX_CACHED_QUERIES, pointer_ttl=POINTER_TTL_SECONDS):
+        self.max_queries = max_queries
+        self.pointer_ttl = pointer_ttl
+        self._lock = threading.Lock()
+        self._entries = {}    # (query, version) -> ResultEntry
+        self._current = {}    # query -> current version
+        self._pointers = {}   # user_id -> [query, version, last_seen]
+        self._next_version = 1
+
+    # --- Entries ---
+    def put(self, query, df, filters, facets, name_index=None, store_status=None, model=None, neighbours=None,
+            max_items=None, created_at=None, shared_version=None):
+        """
+        Stores a fresh result for a query and returns its version.
+        `max_items` is the per-store cap it was scraped with; `created_at`
+        keeps the original publish time of a result loaded from another
+        worker, and `shared_version` is its version there.
+        """
+        query = normalize_query(query)
+        with self._lock:
+            version = self._next_version
+            self._next_version += 1
+            entry = ResultEntry(query, version, df, filters, facets, name_index, store_status, model, neighbours)
+            entry.max_items = max_items
+            if created_at is not None:
+                entry.created_at = created_at
+            entry.shared_version = shared_version
+            entry.checked_at = time.time()
+            self._entries[(query, version)] = entry
+            old_version = self._current.get(query)
+            self._current[query] = version
+            if old_version is not None:
+                self._drop_if_unused(query, old_version)
+            self._evict()
+            return version
+
+    def get(self, query, version=None):
+        """Returns the entry for (query, version), or the current one. None if missing."""
+        query = normalize_query(query)
+        with self._lock:
+            if version is None:
+                version = self._current.get(query)
+            entry = self._entries.get((query, version))
+            if entry is not None:
+                entry.last_access = time.time()
+            return entry
+
+    def age(self, query):
+        """Seconds since the current entry for a query was published, or None. Doesn't count as an access."""
+        query = normalize_query(query)
+        with self._lock:
+            version = self._current.get(query)
+            if version is None:
+                return None
+            return time.time() - self._entries[(query, version)].created_at
+
+    def __contains__(self, query):
+        with self._lock:
+            return normalize_query(query) in self._current
+
+    # --- User pointers ---
+    def point(self, user_id, query, max_age=None, max_items=None):
+        """
+        Points a user at the current entry for a query. Returns the entry,
+        or None if there is none, it is older than `max_age` seconds, or
+        it was scraped with a lower per-store cap than `max_items`.
+        """
+        query = normalize_query(query)
+        with self._lock:
+            version = self._current.get(query)
+            if version is None:
+                return None
+            entry = self._entries[(query, version)]
+            if max_age is not None and time.time() - entry.created_at > max_age:
+                return None
+            if max_items is not None and entry.max_items is not None and entry.max_items < max_items:
+                return None
+            self._release(user_id)
+            entry.refs += 1
+            entry.last_access = time.time()
+            self._pointers[user_id] = [query, version, time.time()]
+            return entry
+
+    def resolve(self, user_id):
+        """
+        Returns the entry a user is looking at. If that version was
+        dropped, falls back to the current entry for the same query.
+        """
+        with self._lock:
+            pointer = self._pointers.get(user_id)
+            if pointer is None:
+                return None
+            query, version, _ = pointer
+            pointer[2] = time.time()
+            entry = self._entries.get((query, version)) or self._entries.get((query, self._current.get(query)))
+            if entry is not None:
+                entry.last_access = time.time()
+            return entry
+
+    def release(self, user_id):
+        """Drops a user's pointer (e.g. on logout)."""
+        with self._lock:
+            self._release(user_id)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "queries": len(self._current),
+                "entries": len(self._entries),
+                "pointers": len(self._pointers),
+            }
+
+    # --- Internals (caller holds the lock) ---
+    def _release(self, user_id):
+        pointer = self._pointers.pop(user_id, None)
+        if pointer is None:
+            return
+        query, version, _ = pointer
+        entry = self._entries.get((query, version))
+        if entry is not None:
+            entry.refs -= 1
+            self._drop_if_unused(query, version)
+
+    def _drop_if_unused(self, query, version):
+        """Superseded versions disappear as soon as nobody points at them."""
+        entry = self._entries.get((query, version))
+        if entry is not None and entry.refs <= 0 and self._current.get(query) != version:
+            del self._entries[(query, version)]
+
+    def _expire_pointers(self):
+        cutoff = time.time() - self.pointer_ttl
+        for user_id in [u for u, p in self._pointers.items() if p[2] < cutoff]:
+            self._release(user_id)
+
+    def _evict(self):
+        if len(self._current) <= self.max_queries:
+            return
+        self._expire_pointers()
+        candidates = sorted(
+            (self._entries[(q, v)] for q, v in self._current.items()),
+            key=lambda e: e.last_access,
+        )
+        for entry in candidates:
+            if len(self._current) <= self.max_queries:
+                break
+            if entry.refs > 0:
+                continue # Pinned by a user
+            del self._current[entry.query]
+            del self._entries[(entry.query, entry.version)]
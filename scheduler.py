@@ -0,0 +1,124 @@
+import concurrent.futures
+import itertools
+import queue
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+# --- Priorities (lower runs first) ---
+PRIORITY_INTERACTIVE = 0   # a user is waiting on this search
+PRIORITY_BACKGROUND = 1    # cache refresh / prewarming
+PRIORITY_TRAINING = 2      # model training
+
+# --- Job classes: each gets its own queue, workers and depth limit ---
+JOB_CLASSES = {
+    "scrape": {"workers": 4, "max_depth": 64},    # I/O-bound browser sessions
+    "process": {"workers": 2, "max_depth": 32},   # CPU-bound frame building
+    "train": {"workers": 1, "max_depth": 8},      # model training
+}
+
+# How many recent wait times we keep per queue for the metrics
+WAIT_SAMPLES = 500
+
+
+class SchedulerBusy(Exception):
+    """Raised when a job queue is full; callers should reject fast."""
+
+
+class _JobQueue:
+    """One priority queue with its own worker threads and metrics."""
+
+    def __init__(self, name, workers, max_depth):
+        self.name = name
+        self.workers = workers
+        self.max_depth = max_depth
+        self.queue = queue.PriorityQueue()
+        self.lock = threading.Lock()
+        self.waits = deque(maxlen=WAIT_SAMPLES)
+        self.running = 0
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        for i in range(workers):
+            threading.Thread(target=self._worker, name=f"{name}-worker-{i}", daemon=True).start()
+
+    def _worker(self):
+        while True:
+            _, _, enqueued_at, future, fn, args, kwargs = self.queue.get()
+            if not future.set_running_or_notify_cancel():
+                continue
+            with self.lock:
+                self.waits.append(time.time() - enqueued_at)
+                self.running += 1
+            try:
+                future.set_result(fn(*args, **kwargs))
+                ok = True
+            except BaseException as e:
+                future.set_exception(e)
+                ok = False
+            with self.lock:
+                self.running -= 1
+                if ok:
+                    self.completed += 1
+                else:
+                    self.failed += 1
+
+    def stats(self):
+        with self.lock:
+            waits = list(self.waits)
+            stats = {
+                "workers": self.workers,
+                "running": self.running,
+                "depth": self.queue.qsize(),
+                "max_depth": self.max_depth,
+                "submitted": self.submitted,
+                "completed": self.completed,
+                "failed": self.failed,
+                "rejected": self.rejected,
+            }
+        if waits:
+            p50, p95, p99 = (float(p) for p in np.percentile(waits, [50, 95, 99]))
+            stats["wait_ms"] = {"p50": round(p50 * 1000, 1), "p95": round(p95 * 1000, 1), "p99": round(p99 * 1000, 1)}
+        return stats
+
+
+class JobScheduler:
+    """
+    Replaces the single shared ThreadPoolExecutor. Scraping, processing
+    and training each get their own queue and concurrency limit, so a
+    training job can never occupy a scraper slot. Within a queue, jobs
+    run by priority (interactive before background before training),
+    FIFO within the same priority. Full queues reject immediately.
+    """
+
+    def __init__(self, job_classes=JOB_CLASSES):
+        self._queues = {name: _JobQueue(name, **config) for name, config in job_classes.items()}
+        self._seq = itertools.count()
+
+    def submit(self, job_class, priority, fn, *args, **kwargs):
+        """Queues one job and returns a Future. Raises SchedulerBusy if the queue is full."""
+        return self.submit_batch(job_class, priority, [(fn, args, kwargs)])[0]
+
+    def submit_batch(self, job_class, priority, jobs):
+        """
+        Queues several (fn, args, kwargs) jobs all-or-nothing, so a search
+        never ends up with only some of its scrapers scheduled.
+        """
+        job_queue = self._queues[job_class]
+        with job_queue.lock:
+            if job_queue.queue.qsize() + len(jobs) > job_queue.max_depth:
+                job_queue.rejected += len(jobs)
+                raise SchedulerBusy(f"'{job_class}' queue is full ({job_queue.max_depth} jobs).")
+            futures = []
+            for fn, args, kwargs in jobs:
+                future = concurrent.futures.Future()
+                job_queue.queue.put((priority, next(self._seq), time.time(), future, fn, args, kwargs))
+                futures.append(future)
+            job_queue.submitted += len(jobs)
+        return futures
+
+    def stats(self):
+        return {name: job_queue.stats() for name, job_queue in self._queues.items()}
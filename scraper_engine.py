@@ -0,0 +1,317 @@
+import functools
+import re
+import threading
+import time
+from collections import defaultdict, deque
+from urllib.parse import quote, urljoin
+
+import numpy as np
+from bs4 import BeautifulSoup
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.support.ui import WebDriverWait
+
+from browser_pool import PAGE_READY_SECONDS, pages_for, pool, scrape_pages, scroll_for_items
+from cdp_network import NetworkCapture, choose
+from fetch_engine import engine as fetch_engine
+from scraper_replay import record_page, resolve_page_urls, resolve_url
+from store_adapters import DEFAULT_PRICE_PATTERNS, STORE_ADAPTERS
+
+# --- One scraping engine for every store adapter (see store_adapters) ---
+DEFAULT_REQUIRED = ("name", "price", "image")
+# Recent runs kept per store for the timing metrics
+TIMING_SAMPLES = 50
+
+# Reads every card on the page in one round trip, instead of one
+# WebDriver call per field per card. Mirrors _soup_value below.
+EXTRACT_JS = """
+const [itemSelector, fields] = arguments;
+function value(card, spec) {
+    if (Array.isArray(spec)) {
+        for (const alternative of spec) {
+            const v = value(card, alternative);
+            if (v) return v;
+        }
+        return null;
+    }
+    if (spec.join !== undefined) {
+        const parts = spec.parts.map(part => value(card, part));
+        return parts.every(Boolean) ? parts.join(spec.join) : null;
+    }
+    const el = (spec.css ? card.querySelectorAll(spec.css) : [card])[spec.index || 0];
+    if (!el) return null;
+    const attr = spec.attr || 'text';
+    let v = attr === 'text' ? el.innerText : (attr === 'href' || attr === 'src') ? el[attr] : el.getAttribute(attr);
+    v = (v || '').trim();
+    if (spec.reject && v.includes(spec.reject)) return null;
+    return v || null;
+}
+return Array.from(document.querySelectorAll(itemSelector)).map(card => {
+    const row = {};
+    for (const [name, spec] of Object.entries(fields)) row[name] = value(card, spec);
+    return row;
+});
+"""
+
+_timings = defaultdict(lambda: deque(maxlen=TIMING_SAMPLES))
+_timings_lock = threading.Lock()
+
+
+# --- Turning raw field values into products ---
+def parse_price(adapter, text):
+    for pattern in adapter.get("price_patterns", DEFAULT_PRICE_PATTERNS):
+        match = re.search(pattern, text or '')
+        if match:
+            return int(match.group(1).replace(',', ''))
+    return 0
+
+
+def _product(adapter, raw, base_url):
+    price = raw.get("price")
+    price = int(price) if isinstance(price, (int, float)) else parse_price(adapter, price)
+    product = {
+        'Product Name': ' '.join(str(raw.get("name") or '').split()),
+        'Price': price,
+        'Image URL': raw.get("image"),
+        'Product URL': urljoin(base_url, raw["url"]) if raw.get("url") else None,
+        'Store': adapter["store"],
+    }
+    keys = {"name": 'Product Name', "price": 'Price', "image": 'Image URL', "url": 'Product URL'}
+    if all(product[keys[field]] for field in adapter.get("required", DEFAULT_REQUIRED)):
+        return product
+    return None
+
+
+def _products(adapter, rows, base_url, seen, limit=None):
+    """Validated, deduped (by URL, else name) products from raw rows."""
+    products = []
+    for raw in rows:
+        product = _product(adapter, raw, base_url)
+        if product is None:
+            continue
+        key = product['Product URL'] or product['Product Name']
+        if key in seen:
+            continue
+        seen.add(key)
+        products.append(product)
+        if limit and len(seen) >= limit:
+            break
+    return products
+
+
+# --- DOM extraction without a browser (HTTP path) ---
+def _soup_value(card, spec):
+    if isinstance(spec, list):
+        for alternative in spec:
+            value = _soup_value(card, alternative)
+            if value:
+                return value
+        return None
+    if "join" in spec:
+        parts = [_soup_value(card, part) for part in spec["parts"]]
+        return spec["join"].join(parts) if all(parts) else None
+    matches = card.select(spec["css"]) if spec.get("css") else [card]
+    index = spec.get("index", 0)
+    if len(matches) <= index:
+        return None
+    attr = spec.get("attr", "text")
+    value = matches[index].get_text(" ", strip=True) if attr == "text" else matches[index].get(attr)
+    value = (value or '').strip()
+    if spec.get("reject") and spec["reject"] in value:
+        return None
+    return value or None
+
+
+def extract_html(adapter, html):
+    """Raw field rows for every card in an HTML page."""
+    fields = adapter["fields"]
+    return [{name: _soup_value(card, spec) for name, spec in fields.items()}
+            for card in BeautifulSoup(html, 'html.parser').select(adapter["item"])]
+
+
+# --- Structured (JSON) listings ---
+def _json_path(node, path):
+    for key in path:
+        if not isinstance(node, dict):
+            return None
+        node = node.get(key)
+    return node
+
+
+def _json_value(item, spec):
+    if isinstance(spec, dict):
+        parts = [_json_value(item, part) for part in spec["parts"]]
+        return spec["join"].join(str(part).strip() for part in parts) if all(parts) else None
+    if spec and isinstance(spec[0], list):
+        for alternative in spec:
+            value = _json_value(item, alternative)
+            if value:
+                return value
+        return None
+    return _json_path(item, spec)
+
+
+def _json_items(payload, path):
+    nodes = [payload]
+    for key in path:
+        if key == "*":
+            nodes = [child for node in nodes if isinstance(node, list) for child in node]
+        else:
+            nodes = [node[key] for node in nodes if isinstance(node, dict) and node.get(key) is not None]
+    return [item for node in nodes if isinstance(node, list) for item in node if isinstance(item, dict)]
+
+
+def extract_json(adapter, payloads):
+    """Raw field rows from listing payloads, with product URLs made absolute."""
+    spec = adapter["json"]
+    rows = []
+    for payload in payloads:
+        for items_path in spec["items"]:
+            for item in _json_items(payload, items_path):
+                row = {name: _json_value(item, field) for name, field in spec["fields"].items()}
+                url = row.get("url")
+                if isinstance(url, str):
+                    for placeholder, value in spec.get("url_replace", {}).items():
+                        url = url.replace(placeholder, value)
+                    if not url.startswith("http"):
+                        url = spec.get("url_prefix", "") + url.lstrip('/')
+                    row["url"] = url
+                rows.append(row)
+    return rows
+
+
+def _structured(adapter, driver, capture):
+    """Listing payloads for the current tab: CDP captures plus the page state."""
+    spec = adapter.get("json")
+    if not spec:
+        return []
+    payloads = list(capture.bodies) if capture is not None else []
+    if spec.get("page_state"):
+        state = driver.execute_script(f"return {spec['page_state']};")
+        if state:
+            payloads.append(state)
+    return extract_json(adapter, payloads)
+
+
+# --- Browser path ---
+def page_urls(adapter, query, pages, http=False):
+    """The URLs to load (replay fixtures in replay mode). `http` prefers the adapter's http_page_url."""
+    template = adapter.get("http_page_url") if http else None
+    template = template or adapter.get("page_url")
+    if template:
+        size = adapter.get("page_size", 20)
+        live = [template.format(query=quote(query), page=page + 1, offset=page * size, size=size)
+                for page in range(pages)]
+        return resolve_page_urls(adapter["fixture"], query, live)
+    return [resolve_url(adapter["fixture"], query, adapter["url"].format(query=quote(query)))]
+
+
+def _read_page(adapter, driver, query, index, seen, limit, timing, capture=None):
+    """Extracts the current tab: structured data if it covers the page, else the DOM."""
+    if index == 0:
+        record_page(adapter["fixture"], query, driver)
+    started = time.perf_counter()
+    rows = driver.execute_script(EXTRACT_JS, adapter["item"], adapter["fields"])
+    structured = choose(_structured(adapter, driver, capture), len(rows), adapter["store"])
+    products = _products(adapter, structured or rows, driver.current_url, seen, limit)
+    timing["extract"] += time.perf_counter() - started
+    timing["pages"] += 1
+    return products
+
+
+def scrape(name, query, deadline=None, max_items=None):
+    """
+    Scrapes one store through its adapter in a pooled browser. Paginated
+    stores open result pages in parallel tabs; others load one page and
+    scroll. Stops at `max_items` unique products, or (returning what it
+    has) once `deadline` (epoch seconds) passes.
+    """
+    adapter = STORE_ADAPTERS[name]
+    print(f"Scraping {adapter['store']} for '{query}'...")
+    started = time.perf_counter()
+    timing = {"extract": 0.0, "pages": 0}
+    seen = set()
+    products_found = []
+    try:
+        with pool.lease() as driver:
+            if "page_url" in adapter:
+                urls = page_urls(adapter, query, pages_for(max_items, adapter.get("page_size", 20),
+                                                           adapter.get("default_pages", 1)))
+                products_found = scrape_pages(
+                    driver, urls, adapter["store"],
+                    lambda tab, index: _read_page(adapter, tab, query, index, seen, max_items, timing),
+                    adapter["ready"], max_items=max_items, deadline=deadline)
+            else:
+                capture = NetworkCapture(driver, adapter["store"], adapter.get("json", {}).get("capture", ()))
+                driver.get(page_urls(adapter, query, 1)[0])
+                timeout = PAGE_READY_SECONDS if deadline is None else max(1, min(PAGE_READY_SECONDS, deadline - time.time()))
+                WebDriverWait(driver, timeout).until(EC.presence_of_element_located((By.CSS_SELECTOR, adapter["ready"])))
+                time.sleep(adapter.get("settle_seconds", 0))
+                scroll_for_items(driver, adapter["item"], max_items, deadline, attempts=adapter.get("scroll", 5))
+                capture.summary()
+                products_found = _read_page(adapter, driver, query, 0, seen, max_items, timing, capture)
+    except Exception as e:
+        print(f"An error occurred while scraping {adapter['store']}: {e}")
+
+    _record_timing(name, query, started, timing, len(products_found))
+    return products_found
+
+
+# --- HTTP path (stores with "http": True) ---
+async def scrape_http(name, query, deadline=None, max_items=None):
+    """
+    Scrapes a paginated store over plain HTTP on the shared fetch engine,
+    all result pages at once (as many as `max_items` needs). Pages that
+    fail or miss the deadline are skipped.
+    """
+    adapter = STORE_ADAPTERS[name]
+    print(f"Scraping {adapter['store']} over HTTP for '{query}'...")
+    started = time.perf_counter()
+    urls = page_urls(adapter, query, pages_for(max_items, adapter.get("page_size", 20), adapter.get("default_pages", 1)),
+                     http=True)
+    pages = await fetch_engine.fetch_all(urls, deadline)
+
+    extract_started = time.perf_counter()
+    seen = set()
+    products_found = []
+    for url, html in zip(urls, pages):
+        if html and not (max_items and len(seen) >= max_items):
+            products_found.extend(_products(adapter, extract_html(adapter, html), url, seen, max_items))
+    timing = {"extract": time.perf_counter() - extract_started, "pages": sum(1 for p in pages if p)}
+    _record_timing(name, query, started, timing, len(products_found))
+    return products_found
+
+
+def scraper(name):
+    """The STORE_SCRAPERS callable for an adapter: f(query, deadline=None, max_items=None)."""
+    return functools.partial(scrape, name)
+
+
+def http_scraper(name):
+    """The HTTP_SCRAPERS coroutine function for an adapter."""
+    return functools.partial(scrape_http, name)
+
+
+# --- Timing metrics ---
+def _record_timing(name, query, started, timing, items):
+    seconds = time.perf_counter() - started
+    with _timings_lock:
+        _timings[name].append((seconds, timing["extract"], timing["pages"], items))
+    print(f"SCRAPE ENGINE: {name} '{query}': {items} items from {timing['pages']} pages in {seconds:.2f}s "
+          f"(extract {timing['extract']:.2f}s).")
+
+
+def stats():
+    """Median total/extract seconds, pages and items over each store's recent runs."""
+    with _timings_lock:
+        runs = {name: np.array(samples) for name, samples in _timings.items() if samples}
+    return {
+        name: {
+            "runs": len(samples),
+            "median_seconds": round(float(np.median(samples[:, 0])), 3),
+            "median_extract_seconds": round(float(np.median(samples[:, 1])), 3),
+            "median_pages": float(np.median(samples[:, 2])),
+            "median_items": float(np.median(samples[:, 3])),
+        }
+        for name, samples in runs.items()
+    }
@@ -0,0 +1,102 @@
+import os
+import re
+import sys
+import threading
+from functools import partial
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+
+# --- Record / replay for the Selenium scrapers ---
+# SMARTCART_SCRAPER_MODE=live    (default) scrape the real stores
+# SMARTCART_SCRAPER_MODE=record  scrape live and save each results page as a fixture
+# SMARTCART_SCRAPER_MODE=replay  serve saved fixtures from a local HTTP server
+#                                and run the same parsing code against them
+DEFAULT_FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'scrapers')
+
+_server = None
+_server_lock = threading.Lock()
+
+
+def scraper_mode():
+    return os.environ.get('SMARTCART_SCRAPER_MODE', 'live').lower()
+
+
+def fixture_dir():
+    return os.environ.get('SMARTCART_FIXTURE_DIR', DEFAULT_FIXTURE_DIR)
+
+
+def _slug(query):
+    return re.sub(r'[^a-z0-9]+', '-', query.lower()).strip('-') or 'empty'
+
+
+def fixture_path(store, query):
+    """Where the recorded results page for (store, query) lives."""
+    return os.path.join(fixture_dir(), store, f'{_slug(query)}.html')
+
+
+class _QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+def _fixture_server():
+    """Starts (once) a static HTTP server over the fixture directory."""
+    global _server
+    with _server_lock:
+        if _server is None:
+            handler = partial(_QuietHandler, directory=fixture_dir())
+            _server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+            threading.Thread(target=_server.serve_forever, daemon=True).start()
+            print(f"REPLAY: Serving scraper fixtures from {fixture_dir()} on port {_server.server_port}")
+        return _server
+
+
+def resolve_url(store, query, live_url):
+    """
+    Returns the URL a scraper should load. In replay mode this is the
+    recorded fixture on the local server; otherwise the live store URL.
+    """
+    if scraper_mode() != 'replay':
+        return live_url
+    path = fixture_path(store, query)
+    if not os.path.exists(path):
+        print(f"REPLAY: No fixture for {store} / '{query}' at {path}")
+    port = _fixture_server().server_port
+    return f'http://127.0.0.1:{port}/{store}/{_slug(query)}.html'
+
+
+def resolve_page_urls(store, query, live_urls):
+    """
+    resolve_url for paginated scrapers: the live page URLs, or in replay
+    mode the single recorded page (fixtures hold page 1 only).
+    """
+    if scraper_mode() != 'replay':
+        return live_urls
+    return [resolve_url(store, query, live_urls[0])]
+
+
+def record_page(store, query, driver):
+    """In record mode, saves the rendered results page (scripts stripped)."""
+    if scraper_mode() != 'record':
+        return
+    html = re.sub(r'<script\b[^>]*>.*?</script>', '', driver.page_source, flags=re.S | re.I)
+    path = fixture_path(store, query)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(html)
+    print(f"RECORD: Saved {store} fixture for '{query}' ({len(html) // 1024} KB)")
+
+
+# Example usage: python scraper_replay.py record shoes "t-shirt"
+if __name__ == "__main__":
+    if len(sys.argv) < 3 or sys.argv[1] not in ('record', 'replay'):
+        print("Usage: python scraper_replay.py record|replay <query> [<query> ...]")
+        sys.exit(1)
+
+    os.environ['SMARTCART_SCRAPER_MODE'] = sys.argv[1]
+    from scraper_engine import scrape
+    from store_adapters import STORE_ADAPTERS
+
+    for query in sys.argv[2:]:
+        for name in STORE_ADAPTERS:
+            products = scrape(name, query)
+            print(f"{name}('{query}'): {len(products)} products")
@@ -0,0 +1,131 @@
+import atexit
+import heapq
+import math
+import threading
+import time
+
+import db_models
+from result_store import normalize_query
+
+# --- Search log and query popularity ---
+# api_search records every search (cache hit or miss) here. Rows are
+# buffered and written to the searches table in batches, so a search costs
+# a list append rather than a SQLite write. The popularity model is built
+# from that table (shared by all workers) and feeds the prewarmer.
+# Buffered rows are written at least this often...
+FLUSH_INTERVAL_SECONDS = 5
+# ...or as soon as this many are waiting
+FLUSH_BATCH_SIZE = 200
+# A search counts half as much after this long
+POPULARITY_HALF_LIFE_SECONDS = 24 * 3600
+# History read at startup; older searches have decayed to almost nothing
+SEED_SECONDS = 7 * 24 * 3600
+# Queries whose decayed count falls below this are forgotten
+MIN_SCORE = 0.05
+
+
+class SearchLog:
+    """
+    Buffers (user_id, query, cache_hit) records and writes them in batches
+    from a background thread, started by the first record.
+    """
+
+    def __init__(self, flush_interval=FLUSH_INTERVAL_SECONDS, batch_size=FLUSH_BATCH_SIZE):
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self._lock = threading.Lock()
+        self._rows = []
+        self._wake = threading.Event()
+        self.logged = 0
+        self._thread = None
+
+    def record(self, user_id, query, cache_hit):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._flush_loop, name="search-log", daemon=True)
+                self._thread.start()
+            self._rows.append((user_id, query, normalize_query(query), int(cache_hit), time.time()))
+            full = len(self._rows) >= self.batch_size
+        if full:
+            self._wake.set()
+
+    def flush(self):
+        """Writes everything buffered so far. Returns how many rows."""
+        with self._lock:
+            rows, self._rows = self._rows, []
+        if rows:
+            db_models.log_searches(rows)
+            self.logged += len(rows)
+        return len(rows)
+
+    def _flush_loop(self):
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"SEARCH LOG: Flush failed: {e}")
+
+
+class PopularityModel:
+    """
+    Exponentially decayed search counts per normalized query. Each query
+    keeps (score, updated_at); a search decays the score to now and adds 1,
+    so a query searched n times an hour ago ranks like n/2 searches one
+    half-life earlier would. sync() reads only rows added since the last
+    one, like the co-occurrence graph.
+    """
+
+    def __init__(self, half_life=POPULARITY_HALF_LIFE_SECONDS, seed_seconds=SEED_SECONDS):
+        self.half_life = half_life
+        self.seed_seconds = seed_seconds
+        self._lock = threading.Lock()
+        self._scores = {} # normalized query -> [score, updated_at]
+        self._last_id = 0
+
+    def _decayed(self, score, updated_at, now):
+        return score * math.pow(0.5, (now - updated_at) / self.half_life)
+
+    def add(self, query, timestamp=None):
+        timestamp = time.time() if timestamp is None else timestamp
+        with self._lock:
+            entry = self._scores.get(query)
+            if entry is None:
+                self._scores[query] = [1.0, timestamp]
+            else:
+                entry[0] = self._decayed(entry[0], entry[1], timestamp) + 1.0
+                entry[1] = max(entry[1], timestamp)
+
+    def sync(self):
+        """Applies searches logged since the last sync (the last seed_seconds on the first). Returns how many."""
+        since = time.time() - self.seed_seconds if self._last_id == 0 else 0
+        rows = db_models.get_searches(self._last_id, since)
+        for row_id, query, timestamp in rows:
+            self.add(query, timestamp)
+            self._last_id = row_id
+        if rows:
+            self._prune()
+        return len(rows)
+
+    def _prune(self):
+        now = time.time()
+        with self._lock:
+            for query in [q for q, (s, t) in self._scores.items() if self._decayed(s, t, now) < MIN_SCORE]:
+                del self._scores[query]
+
+    def top(self, n):
+        """The n most popular queries as (query, score), highest first."""
+        now = time.time()
+        with self._lock:
+            scored = [(query, self._decayed(s, t, now)) for query, (s, t) in self._scores.items()]
+        return heapq.nlargest(n, scored, key=lambda item: item[1])
+
+    def __len__(self):
+        with self._lock:
+            return len(self._scores)
+
+
+# --- Shared log; whatever is still buffered is written when the process exits ---
+search_log = SearchLog()
+atexit.register(search_log.flush)
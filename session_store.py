@@ -0,0 +1,119 @@
+import secrets
+import sqlite3
+import threading
+import time
+
+import msgspec
+from flask.sessions import SessionInterface, SessionMixin
+from itsdangerous import BadSignature, Signer
+from werkzeug.datastructures import CallbackDict
+
+# --- Server-side sessions in SQLite ---
+# Replaces the Flask-Session filesystem store (one file per session, read
+# and often rewritten on every request). Shared by all workers on a host.
+DEFAULT_SESSION_PATH = 'sessions.db'
+# How often expired sessions are deleted
+SESSION_GC_INTERVAL_SECONDS = 10 * 60
+
+
+class SQLiteSession(CallbackDict, SessionMixin):
+    """Session dict that remembers whether it was changed during the request."""
+
+    def __init__(self, initial=None, sid=None, new=False):
+        def on_update(self):
+            self.modified = True
+        CallbackDict.__init__(self, initial, on_update)
+        self.sid = sid
+        self.new = new
+        self.modified = False
+
+
+class SQLiteSessionInterface(SessionInterface):
+    """
+    Sessions stored in one SQLite table (WAL mode), keyed by a random id
+    carried in a signed cookie. A request that doesn't change the session
+    costs one indexed read and no write, and the cookie is only sent when
+    a session is created. Expired rows are deleted by a background thread.
+    """
+
+    def __init__(self, path=DEFAULT_SESSION_PATH, gc_interval=SESSION_GC_INTERVAL_SECONDS):
+        self.path = path
+        self.gc_interval = gc_interval
+        self._local = threading.local()
+        self._gc_thread = None
+        self._gc_lock = threading.Lock()
+        self._conn().execute('''
+        CREATE TABLE IF NOT EXISTS sessions (
+            sid TEXT PRIMARY KEY,
+            data BLOB NOT NULL,
+            expires REAL NOT NULL
+        )''')
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def _signer(self, app):
+        return Signer(app.secret_key, salt='smartcart-session')
+
+    def open_session(self, app, request):
+        self._start_gc()
+        cookie = request.cookies.get(self.get_cookie_name(app))
+        if cookie:
+            try:
+                sid = self._signer(app).unsign(cookie).decode()
+            except BadSignature:
+                sid = None
+            if sid:
+                row = self._conn().execute('SELECT data FROM sessions WHERE sid = ? AND expires > ?',
+                                           (sid, time.time())).fetchone()
+                if row is not None:
+                    return SQLiteSession(msgspec.json.decode(row[0]), sid=sid)
+        return SQLiteSession(sid=secrets.token_urlsafe(32), new=True)
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+        if not session:
+            # Cleared (e.g. logout): drop the row and the cookie
+            if not session.new:
+                self._conn().execute('DELETE FROM sessions WHERE sid = ?', (session.sid,))
+                response.delete_cookie(name, domain=domain, path=path)
+            return
+        if not (session.modified or session.new):
+            return # Nothing changed, nothing to write
+
+        expires = time.time() + app.permanent_session_lifetime.total_seconds()
+        self._conn().execute('INSERT OR REPLACE INTO sessions (sid, data, expires) VALUES (?, ?, ?)',
+                             (session.sid, msgspec.json.encode(dict(session)), expires))
+        if session.new:
+            response.set_cookie(
+                name, self._signer(app).sign(session.sid).decode(),
+                expires=self.get_expiration_time(app, session), httponly=self.get_cookie_httponly(app),
+                domain=domain, path=path, secure=self.get_cookie_secure(app),
+                samesite=self.get_cookie_samesite(app),
+            )
+
+    # --- Background cleanup ---
+    def _start_gc(self):
+        if self._gc_thread is not None:
+            return
+        with self._gc_lock:
+            if self._gc_thread is None:
+                self._gc_thread = threading.Thread(target=self._gc_loop, name="session-gc", daemon=True)
+                self._gc_thread.start()
+
+    def _gc_loop(self):
+        while True:
+            self.collect_garbage()
+            time.sleep(self.gc_interval)
+
+    def collect_garbage(self):
+        """Deletes expired sessions; returns how many."""
+        return self._conn().execute('DELETE FROM sessions WHERE expires <= ?', (time.time(),)).rowcount
@@ -0,0 +1,210 @@
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+import msgspec
+
+# --- Shared state for running several app worker processes ---
+# SMARTCART_STATE_BACKEND=local               (default) one process, nothing is shared
+# SMARTCART_STATE_BACKEND=sqlite[:<path>]     tasks, streamed products and finished
+#                                             results go through a SQLite file (WAL),
+#                                             so any worker can answer any poll
+DEFAULT_STATE_PATH = 'shared_state.db'
+# Finished results kept in the shared store (oldest dropped first)
+MAX_SHARED_RESULTS = 50
+
+
+class LocalStateBackend:
+    """
+    Single-process backend: the task registry and result store already
+    hold everything, so writes are dropped and lookups find nothing.
+    """
+    shared = False
+
+    def save_task(self, task_id, query, status, stores):
+        pass
+
+    def update_task(self, task_id, **fields):
+        pass
+
+    def append_products(self, task_id, start, products):
+        pass
+
+    def read_task(self, task_id, since=0):
+        return None
+
+    def delete_task(self, task_id):
+        pass
+
+    def expire_tasks(self, max_age):
+        return 0
+
+    def save_result(self, query, bundle, created_at=None):
+        return None
+
+    def result_info(self, query):
+        return None
+
+    def load_result(self, query):
+        return None
+
+
+class SQLiteStateBackend:
+    """
+    Keeps task status, each task's streamed product batches and finished
+    results in one SQLite database in WAL mode, so readers in other
+    worker processes never block the writer. The worker that runs a
+    search writes through to it; the others read from it.
+    """
+    shared = True
+
+    def __init__(self, path=DEFAULT_STATE_PATH):
+        self.path = path
+        self._local = threading.local()
+        conn = self._conn()
+        conn.executescript('''
+        CREATE TABLE IF NOT EXISTS tasks (
+            task_id TEXT PRIMARY KEY,
+            query TEXT NOT NULL,
+            status TEXT NOT NULL,
+            message TEXT,
+            stores BLOB,
+            cursor INTEGER NOT NULL DEFAULT 0,
+            created_at REAL NOT NULL,
+            updated_at REAL NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS task_products (
+            task_id TEXT NOT NULL,
+            start INTEGER NOT NULL,
+            count INTEGER NOT NULL,
+            products BLOB NOT NULL,
+            PRIMARY KEY (task_id, start)
+        );
+        CREATE TABLE IF NOT EXISTS results (
+            query TEXT PRIMARY KEY,
+            bundle BLOB NOT NULL,
+            version INTEGER NOT NULL DEFAULT 0,
+            created_at REAL NOT NULL
+        );
+        ''')
+        if 'version' not in {row[1] for row in conn.execute('PRAGMA table_info(results)')}:
+            conn.execute('ALTER TABLE results ADD COLUMN version INTEGER NOT NULL DEFAULT 0') # Older files
+
+    def _conn(self):
+        """One connection per thread (sqlite3 connections aren't thread-safe)."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    # --- Tasks ---
+    def save_task(self, task_id, query, status, stores):
+        now = time.time()
+        self._conn().execute(
+            'INSERT OR REPLACE INTO tasks (task_id, query, status, stores, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?)',
+            (task_id, query, status, msgspec.json.encode(stores), now, now))
+
+    def update_task(self, task_id, **fields):
+        """Sets any of status, message, stores."""
+        if 'stores' in fields:
+            fields['stores'] = msgspec.json.encode(fields['stores'])
+        fields['updated_at'] = time.time()
+        columns = ', '.join(f'{column} = ?' for column in fields)
+        self._conn().execute(f'UPDATE tasks SET {columns} WHERE task_id = ?', (*fields.values(), task_id))
+
+    def append_products(self, task_id, start, products):
+        """Appends one batch to a task's product log at offset `start`."""
+        conn = self._conn()
+        with conn:
+            conn.execute('BEGIN')
+            conn.execute('INSERT OR REPLACE INTO task_products (task_id, start, count, products) VALUES (?, ?, ?, ?)',
+                         (task_id, start, len(products), msgspec.json.encode(products)))
+            conn.execute('UPDATE tasks SET cursor = MAX(cursor, ?), updated_at = ? WHERE task_id = ?',
+                         (start + len(products), time.time(), task_id))
+
+    def read_task(self, task_id, since=0):
+        """
+        Returns {status, query, message, stores, cursor, new_products}
+        with the products past `since`, or None if the task is unknown.
+        """
+        conn = self._conn()
+        with conn:
+            conn.execute('BEGIN')
+            row = conn.execute('SELECT query, status, message, stores, cursor FROM tasks WHERE task_id = ?',
+                               (task_id,)).fetchone()
+            if row is None:
+                return None
+            query, status, message, stores, cursor = row
+            batches = conn.execute(
+                'SELECT start, products FROM task_products WHERE task_id = ? AND start + count > ? AND start < ? ORDER BY start',
+                (task_id, since, cursor)).fetchall()
+        new_products = []
+        for start, products in batches:
+            new_products.extend(msgspec.json.decode(products)[max(since - start, 0):])
+        return {
+            "status": status,
+            "query": query,
+            "message": message,
+            "stores": msgspec.json.decode(stores) if stores else {},
+            "cursor": cursor,
+            "new_products": new_products,
+        }
+
+    def delete_task(self, task_id):
+        conn = self._conn()
+        with conn:
+            conn.execute('BEGIN')
+            conn.execute('DELETE FROM task_products WHERE task_id = ?', (task_id,))
+            conn.execute('DELETE FROM tasks WHERE task_id = ?', (task_id,))
+
+    def expire_tasks(self, max_age):
+        """Drops tasks older than max_age seconds (e.g. from a worker that died)."""
+        cutoff = time.time() - max_age
+        conn = self._conn()
+        with conn:
+            conn.execute('BEGIN')
+            conn.execute('DELETE FROM task_products WHERE task_id IN (SELECT task_id FROM tasks WHERE created_at < ?)', (cutoff,))
+            return conn.execute('DELETE FROM tasks WHERE created_at < ?', (cutoff,)).rowcount
+
+    # --- Finished results ---
+    def save_result(self, query, bundle, created_at=None):
+        """
+        Stores the latest processed result for a query (a dict with df,
+        filters, facets, name_index, store_status) for other workers.
+        Returns its shared version, which goes up by one per save.
+        """
+        conn = self._conn()
+        with conn:
+            conn.execute('BEGIN IMMEDIATE') # Read and bump the version atomically
+            row = conn.execute('SELECT version FROM results WHERE query = ?', (query,)).fetchone()
+            version = (row[0] if row else 0) + 1
+            conn.execute('INSERT OR REPLACE INTO results (query, bundle, version, created_at) VALUES (?, ?, ?, ?)',
+                         (query, pickle.dumps(bundle, protocol=pickle.HIGHEST_PROTOCOL), version,
+                          time.time() if created_at is None else created_at))
+            conn.execute('DELETE FROM results WHERE query NOT IN '
+                         '(SELECT query FROM results ORDER BY created_at DESC LIMIT ?)', (MAX_SHARED_RESULTS,))
+        return version
+
+    def result_info(self, query):
+        """(version, created_at) of the shared result for a query, without loading it. None if there is none."""
+        return self._conn().execute('SELECT version, created_at FROM results WHERE query = ?', (query,)).fetchone()
+
+    def load_result(self, query):
+        """(bundle, version, created_at) of the shared result for a query, or None."""
+        row = self._conn().execute('SELECT bundle, version, created_at FROM results WHERE query = ?', (query,)).fetchone()
+        return (pickle.loads(row[0]), row[1], row[2]) if row else None
+
+def create_backend(spec=None):
+    """Builds the backend named by `spec` or SMARTCART_STATE_BACKEND ('local' or 'sqlite[:path]')."""
+    spec = spec or os.environ.get('SMARTCART_STATE_BACKEND', 'local')
+    kind, _, path = spec.partition(':')
+    if kind == 'local':
+        return LocalStateBackend()
+    if kind == 'sqlite':
+        return SQLiteStateBackend(path or DEFAULT_STATE_PATH)
+    raise ValueError(f"Unknown state backend '{spec}'.")
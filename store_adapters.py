@@ -0,0 +1,135 @@
+# --- Store adapters: everything store-specific about scraping, as config ---
+# scraper_engine runs every adapter with the same driver pool, pagination,
+# batched extraction, early termination and timing metrics, so adding a
+# store is an entry here rather than another Selenium loop.
+#
+# Keys:
+#   store           'Store' value on each product
+#   fixture         record/replay fixture directory (scraper_replay)
+#   url             search page, {query} is URL-encoded; loaded and scrolled
+#   page_url        paginated alternative to `url`: {query}, {page} (1-based),
+#                   {offset}, {size}; pages are opened in parallel tabs
+#   page_size       products per page (sizes the page count for max_items)
+#   default_pages   pages fetched when the search sets no max_items
+#   scroll          scroll attempts for `url` stores (infinite scroll)
+#   settle_seconds  wait after load before scrolling, for slow-rendering pages
+#   ready           CSS selector that means results are on the page
+#   item            CSS selector for one product card
+#   fields          name / price / image / url, each a field spec (below)
+#   required        fields a product must have to be kept
+#   price_patterns  regexes tried in order on the price text; group 1 is the number
+#   json            structured data, used when it covers every card on the page:
+#                     page_state   JS expression returning the page's listing data
+#                     capture      listing API URL regexes, captured over CDP
+#                     items        paths to the product arrays ('*' walks a list)
+#                     fields       name / price / image / url as JSON paths
+#                     url_prefix   prepended to relative product URLs
+#                     url_replace  {placeholder: value} substitutions in product URLs
+#   http            True if the plain-HTTP path can scrape it (no JS needed)
+#   http_page_url   page_url for the HTTP path only; the browser keeps `url`
+#
+# A DOM field spec is {"css": selector (omit for the card itself),
+# "attr": "text" (default) or an attribute, "index": nth match,
+# "reject": substring that marks the value unusable}. A list of specs means
+# "first non-empty"; {"join": sep, "parts": [...]} concatenates.
+# A JSON field is a key path like ["price", "currentPrice"], a list of
+# paths (first present wins), or {"join": sep, "parts": [...]}.
+DEFAULT_PRICE_PATTERNS = (r'([\d,]+)',)
+
+STORE_ADAPTERS = {
+    "Myntra": {
+        "store": "Myntra",
+        "fixture": "myntra",
+        "page_url": "https://www.myntra.com/{query}?p={page}",
+        "page_size": 50,
+        "default_pages": 1,
+        "ready": ".results-base",
+        "item": ".results-base .product-base",
+        "fields": {
+            "name": {"join": " - ", "parts": [{"css": ".product-brand"}, {"css": ".product-product"}]},
+            "price": {"css": "span.product-discountedPrice, div.product-price"},
+            "image": {"css": "img", "attr": "src"},
+            "url": {"css": "a", "attr": "href"},
+        },
+        "required": ("name", "price"),
+        "price_patterns": (r'Rs\.\s*([\d,]+)', r'([\d,]+)'),
+        "json": {
+            "page_state": "(window.__myx && window.__myx.searchData && window.__myx.searchData.results) || null",
+            "items": [["products"]],
+            "fields": {
+                "name": {"join": " - ", "parts": [["brand"], [["additionalInfo"], ["productName"]]]},
+                "price": ["price"],
+                "image": ["searchImage"],
+                "url": ["landingPageUrl"],
+            },
+            "url_prefix": "https://www.myntra.com/",
+        },
+    },
+    "Snapdeal": {
+        "store": "Snapdeal",
+        "fixture": "snapdeal",
+        "url": "https://www.snapdeal.com/search?keyword={query}",
+        "scroll": 5,
+        # The result fragments the search page loads while scrolling; not
+        # verified for the browser, so only the opt-in HTTP path uses them
+        "http_page_url": ("https://www.snapdeal.com/acors/json/product/get/search/0/{offset}/{size}"
+                          "?q=&sort=rlvncy&keyword={query}&clickSrc=&viewType=List&lang=en&snr=false"),
+        "page_size": 20,
+        "default_pages": 5,
+        "ready": ".product-tuple-listing",
+        "item": ".product-tuple-listing",
+        "fields": {
+            "name": {"css": ".product-title"},
+            "price": {"css": ".product-price"},
+            "image": [{"css": "img", "attr": "src", "reject": "grey"}, {"css": "img", "attr": "data-src"}],
+            "url": {"css": ".dp-widget-link", "attr": "href"},
+        },
+        "http": True,
+    },
+    "Nike": {
+        "store": "nike",
+        "fixture": "nike",
+        "url": "https://www.nike.com/search?keyword={query}",
+        "scroll": 5,
+        "ready": ".product-card",
+        "item": ".product-card",
+        "fields": {
+            "name": {"css": ".product-card__title"},
+            "price": {"css": ".product-price"},
+            "image": [{"css": "img", "attr": "src", "reject": "grey"}, {"css": "img", "attr": "data-src"}],
+            "url": {"css": "a.product-card__link-overlay", "attr": "href"},
+        },
+        "json": {
+            # The product wall API, called for each batch loaded while scrolling
+            "capture": [r'api\.nike\.com/(cic/browse|discover/product_wall)/'],
+            "items": [["productGroupings", "*", "products"], ["data", "products", "products"]],
+            "fields": {
+                "name": [["copy", "title"], ["title"]],
+                "price": [["prices", "currentPrice"], ["price", "currentPrice"]],
+                "image": [["colorwayImages", "squarishURL"], ["images", "squarishURL"]],
+                "url": [["pdpUrl", "url"], ["url"]],
+            },
+            "url_prefix": "https://www.nike.com/",
+            "url_replace": {"{countryLang}": "in"},
+        },
+    },
+    "MaxFashion": {
+        "store": "Max Fashion",
+        "fixture": "max_fashion",
+        "url": "https://www.maxfashion.in/in/en/search?q={query}",
+        "scroll": 10,
+        "settle_seconds": 5,
+        "ready": "div.product",
+        "item": "div.product",
+        "fields": {
+            # The second link carries the product name; the image alt text is the fallback
+            "name": [{"css": "a", "index": 1}, {"css": "img", "attr": "alt"}],
+            # The first price on the card is the selling price
+            "price": {},
+            "image": {"css": "img", "attr": "src"},
+            "url": {"css": "a", "attr": "href", "index": 1},
+        },
+        "required": ("name", "price", "image", "url"),
+        "price_patterns": (r'₹\s*([\d,]+)',),
+    },
+}
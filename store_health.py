@@ -0,0 +1,126 @@
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+# --- Circuit breaker settings ---
+# This many failed or empty scrapes in a row opens a store's circuit
+FAILURE_THRESHOLD = 3
+# How long an open circuit skips the store before letting one probe through
+COOLDOWN_SECONDS = 5 * 60
+# Each failed probe doubles the cooldown, up to this
+MAX_COOLDOWN_SECONDS = 60 * 60
+# A probe is a downgraded run: it gets at most this long before returning
+PROBE_BUDGET_SECONDS = 15
+# Recent runs kept per store for the rolling metrics
+HEALTH_WINDOW = 50
+
+CLOSED = "closed"        # healthy, runs normally
+OPEN = "open"            # broken, skipped until the cooldown ends
+HALF_OPEN = "half_open"  # cooling down is over, one probe run is allowed
+
+
+class _StoreState:
+    def __init__(self):
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.cooldown = COOLDOWN_SECONDS
+        self.opened_at = None
+        self.probe_in_flight = False
+        self.skipped = 0
+        self.runs = deque(maxlen=HEALTH_WINDOW)  # (ok, seconds, items)
+        self.last_error = None
+
+
+class StoreHealth:
+    """
+    Tracks scraper health per store and decides whether a search should
+    launch that store at all. After FAILURE_THRESHOLD failed or empty runs
+    in a row the store's circuit opens and searches skip it, so a broken
+    store stops holding Chrome sessions. Once the cooldown passes a single
+    probe run (with a short budget) is let through: success closes the
+    circuit, failure re-opens it with a longer cooldown.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stores = {}
+
+    def _get(self, store):
+        state = self._stores.get(store)
+        if state is None:
+            state = self._stores[store] = _StoreState()
+        return state
+
+    def acquire(self, store):
+        """
+        Asks whether a search may run `store`. Returns CLOSED (run normally),
+        HALF_OPEN (run as the recovery probe) or None (skip it). A HALF_OPEN
+        caller must report back through record().
+        """
+        with self._lock:
+            state = self._get(store)
+            if state.state == OPEN and time.time() - state.opened_at >= state.cooldown:
+                state.state = HALF_OPEN
+            if state.state == CLOSED:
+                return CLOSED
+            if state.state == HALF_OPEN and not state.probe_in_flight:
+                state.probe_in_flight = True
+                return HALF_OPEN
+            state.skipped += 1
+            return None
+
+    def record(self, store, ok, seconds, items, error=None):
+        """Reports one scraper run. `ok` is False for exceptions and empty results."""
+        with self._lock:
+            state = self._get(store)
+            state.runs.append((ok, seconds, items))
+            probe = state.probe_in_flight
+            state.probe_in_flight = False
+            if ok:
+                state.consecutive_failures = 0
+                state.last_error = None
+                if state.state != CLOSED:
+                    print(f"STORE HEALTH: '{store}' recovered, closing circuit.")
+                state.state = CLOSED
+                state.cooldown = COOLDOWN_SECONDS
+                return
+            state.consecutive_failures += 1
+            state.last_error = error or "no items"
+            if probe:
+                state.cooldown = min(state.cooldown * 2, MAX_COOLDOWN_SECONDS)
+            if probe or (state.state == CLOSED and state.consecutive_failures >= FAILURE_THRESHOLD):
+                state.state = OPEN
+                state.opened_at = time.time()
+                print(f"STORE HEALTH: '{store}' circuit OPEN for {state.cooldown}s ({state.last_error}).")
+
+    def release(self, store):
+        """Gives back a probe slot that was acquired but never run."""
+        with self._lock:
+            self._get(store).probe_in_flight = False
+
+    def stats(self):
+        with self._lock:
+            snapshot = {store: (state.state, state.consecutive_failures, state.cooldown, state.opened_at,
+                                state.skipped, list(state.runs), state.last_error)
+                        for store, state in self._stores.items()}
+        stats = {}
+        for store, (state, failures, cooldown, opened_at, skipped, runs, last_error) in snapshot.items():
+            store_stats = {
+                "state": state,
+                "consecutive_failures": failures,
+                "skipped": skipped,
+                "runs": len(runs),
+                "last_error": last_error,
+            }
+            if state != CLOSED and opened_at is not None:
+                store_stats["retry_in_seconds"] = max(0, round(opened_at + cooldown - time.time()))
+            if runs:
+                ok, seconds, items = (np.array(column) for column in zip(*runs))
+                store_stats["success_rate"] = round(float(ok.mean()), 3)
+                store_stats["latency_seconds"] = {"p50": round(float(np.percentile(seconds, 50)), 1),
+                                                  "p95": round(float(np.percentile(seconds, 95)), 1)}
+                store_stats["avg_items"] = round(float(items.mean()), 1)
+            stats[store] = store_stats
+        return stats
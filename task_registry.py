@@ -0,0 +1,135 @@
+import threading
+import time
+import uuid
+
+from state_backend import LocalStateBackend
+
+# Searches still in flight (not yet SUCCESS/ERROR) we accept at once
+MAX_ACTIVE_TASKS = 64
+# A finished task stays readable this long, so other tabs and retried polls still find it
+RESULT_GRACE_SECONDS = 5 * 60
+# Hard limit on any task's lifetime; catches searches nobody ever polled again
+TASK_TTL_SECONDS = 15 * 60
+# How often the reaper looks for expired tasks
+REAP_INTERVAL_SECONDS = 30
+
+# Allowed status changes. SUCCESS -> SUCCESS is a late-result merge.
+TRANSITIONS = {
+    "PENDING": {"PROCESSING", "ERROR"},
+    "PROCESSING": {"SUCCESS", "ERROR"},
+    "SUCCESS": {"SUCCESS"},
+    "ERROR": set(),
+}
+FINISHED = ("SUCCESS", "ERROR")
+
+
+class TooManyTasks(Exception):
+    """Raised when MAX_ACTIVE_TASKS searches are already in flight."""
+
+
+class TaskRegistry:
+    """
+    Holds the state of in-flight searches (replaces the bare task_cache dict).
+
+    Every task records when it was created and last changed. Status changes
+    go through transition(), which only allows the moves in TRANSITIONS.
+    A background reaper drops finished tasks after RESULT_GRACE_SECONDS and
+    any task after TASK_TTL_SECONDS, so abandoned searches don't keep their
+    product lists forever. Callers hold `lock` while reading or changing a task.
+
+    Status, store progress and the product log are written through to the
+    state backend, so with a shared backend other worker processes can
+    answer polls for this task.
+    """
+
+    def __init__(self, max_active=MAX_ACTIVE_TASKS, grace=RESULT_GRACE_SECONDS, ttl=TASK_TTL_SECONDS, backend=None):
+        self.max_active = max_active
+        self.grace = grace
+        self.ttl = ttl
+        self.backend = backend or LocalStateBackend()
+        self.lock = threading.Lock()
+        self._tasks = {}
+        self._reaper = None
+
+    def create(self, task):
+        """Registers a new PENDING task and returns its id. Raises TooManyTasks."""
+        self._start_reaper()
+        with self.lock:
+            active = sum(1 for t in self._tasks.values() if t["status"] not in FINISHED)
+            if active >= self.max_active:
+                raise TooManyTasks(f"{active} searches already in progress.")
+            task_id = str(uuid.uuid4())
+            now = time.time()
+            task.update(id=task_id, status="PENDING", created_at=now, updated_at=now)
+            self._tasks[task_id] = task
+            self.backend.save_task(task_id, task["query"], "PENDING", task["stores"])
+            return task_id
+
+    def get(self, task_id):
+        """Returns the task or None (caller holds the lock)."""
+        return self._tasks.get(task_id)
+
+    def discard(self, task_id):
+        """Drops a task, cancelling its deadline timer (caller holds the lock)."""
+        task = self._tasks.pop(task_id, None)
+        if task is not None and task.get("deadline_timer") is not None:
+            task["deadline_timer"].cancel()
+        self.backend.delete_task(task_id)
+
+    def transition(self, task, status, **fields):
+        """
+        Moves a task to `status` (caller holds the lock) and sets any extra
+        fields. Returns False, changing nothing, if the move isn't allowed.
+        """
+        if status not in TRANSITIONS[task["status"]]:
+            return False
+        task.update(fields)
+        task["status"] = status
+        task["updated_at"] = time.time()
+        self.backend.update_task(task["id"], status=status, message=task.get("message"))
+        return True
+
+    def append_products(self, task, products):
+        """Appends to a task's product log (caller holds the lock)."""
+        start = len(task["all_products"])
+        task["all_products"].extend(products)
+        self.backend.append_products(task["id"], start, products)
+
+    def set_store_status(self, task, store, status):
+        """Records one store's progress (caller holds the lock)."""
+        task["stores"][store] = status
+        self.backend.update_task(task["id"], stores=task["stores"])
+
+    def __len__(self):
+        with self.lock:
+            return len(self._tasks)
+
+    # --- Reaper ---
+    def _start_reaper(self):
+        with self.lock:
+            if self._reaper is None:
+                self._reaper = threading.Thread(target=self._reap_loop, name="task-reaper", daemon=True)
+                self._reaper.start()
+
+    def _reap_loop(self):
+        while True:
+            time.sleep(REAP_INTERVAL_SECONDS)
+            self.reap()
+
+    def reap(self):
+        """Drops expired tasks. Returns how many were removed."""
+        now = time.time()
+        with self.lock:
+            expired = [
+                task_id for task_id, task in self._tasks.items()
+                if now - task["created_at"] > self.ttl
+                or (task["status"] in FINISHED and now - task["updated_at"] > self.grace
+                    and task["remaining_scrapers"] == 0 and not task["processing"])
+            ]
+            for task_id in expired:
+                self.discard(task_id)
+        # Plus shared tasks left behind by worker processes that went away
+        dropped = len(expired) + self.backend.expire_tasks(self.ttl)
+        if dropped:
+            print(f"TASK REAPER: Dropped {dropped} expired tasks.")
+        return dropped